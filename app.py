@@ -1,6 +1,8 @@
 import dash
 from dash import html, dcc
 import dash_bootstrap_components as dbc
+from flask import Response, request, jsonify
+from pages import export, route_matrix
 
 app = dash.Dash(
     __name__,
@@ -19,5 +21,53 @@ app.layout = dbc.Container(
     fluid=True 
 )
 
+
+@server.route("/api/routes/matrix", methods=["POST"])
+def route_matrix_api():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    sources = body.get("sources") or []
+    targets = body.get("targets") or []
+    if not all(isinstance(names, list) and names and all(isinstance(n, str) for n in names) for names in (sources, targets)):
+        return jsonify({"error": "'sources' and 'targets' must be non-empty lists of location names"}), 400
+    with_paths = bool(body.get("paths"))
+    limit = route_matrix.MAX_PATH_CELLS if with_paths else route_matrix.MAX_CELLS
+    if len(sources) * len(targets) > limit:
+        return jsonify({"error": "at most %d sources x targets per request%s" % (limit, " with paths" if with_paths else "")}), 413
+
+    result = route_matrix.distance_matrix(
+        sources,
+        targets,
+        accessible_only=bool(body.get("accessible_only")),
+        with_paths=with_paths
+    )
+    distances = [[d if d != float("inf") else None for d in row] for row in result["distances"].tolist()]
+    return jsonify({
+        "sources": result["sources"],
+        "targets": result["targets"],
+        "distances": distances,
+        "paths": result["paths"]
+    })
+
+
+@server.route("/api/export/<table>.<fmt>", methods=["GET"])
+def export_api(table, fmt):
+    if table not in export.FILTERS or fmt not in export.FORMATS:
+        return jsonify({"error": "exports are routes, locations or notifications as .csv or .json"}), 404
+    try:
+        filters = export.parse_filters(table, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # no Content-Length, so the response goes out with chunked transfer encoding
+    rows = export.records(table, filters, request.args.get("q"))
+    return Response(
+        export.stream(table, fmt, rows),
+        mimetype=export.FORMATS[fmt],
+        headers={"Content-Disposition": "attachment; filename=%s.%s" % (table, fmt)}
+    )
+
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
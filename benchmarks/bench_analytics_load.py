@@ -0,0 +1,82 @@
+# Compare loading the routes table for the analytics page from the CSV with
+# loading column projections from the Parquet snapshot.
+#
+#   python -m benchmarks.bench_analytics_load [routes]
+
+import os
+import csv
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+
+def write_routes(path, count, seed=1):
+    rng = random.Random(seed)
+    names = [f"Building {i // 10} Room {i % 10}" for i in range(2000)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "start_location", "end_location", "distance_m", "accessible"])
+        for i in range(1, count + 1):
+            a, b = rng.sample(names, 2)
+            writer.writerow([i, a, b, rng.randint(5, 600), rng.random() < 0.7])
+
+
+def parse_csv(path):
+    # the row-by-row load the analytics page used to do on every visit
+    routes = []
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            routes.append({
+                'id': int(row['id']),
+                'start_location': row['start_location'],
+                'end_location': row['end_location'],
+                'distance_m': float(row['distance_m']),
+                'accessible': row['accessible'].lower() == 'true'
+            })
+    return routes
+
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<42} {best * 1000:9.1f} ms")
+    return best
+
+
+def main(count=1_000_000):
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        os.mkdir("data")
+        write_routes("data/routes.csv", count)
+        from pages import columnar, storage
+        if columnar.pq is None:
+            print("pyarrow is not installed; the analytics page uses the CSV records")
+            return
+
+        print(f"{count} routes, csv {os.path.getsize('data/routes.csv') / 1e6:.1f} MB")
+        baseline = timed("csv.DictReader, all columns", lambda: parse_csv("data/routes.csv"), 1)
+        timed("storage records (cold), all columns", lambda: storage.CsvStorage().records('routes'), 1)
+
+        start = time.perf_counter()
+        columnar.read('routes', ['distance_m'])
+        print(f"{'first read (writes the snapshot)':<42} {(time.perf_counter() - start) * 1000:9.1f} ms")
+        print(f"parquet {os.path.getsize(columnar.PATHS['routes']) / 1e6:.1f} MB")
+
+        for columns in (['distance_m'], ['start_location', 'end_location'], None):
+            label = "parquet, " + (", ".join(columns) if columns else "all columns")
+            best = timed(label, lambda: columnar.read('routes', columns))
+            print(f"{'':<42} {baseline / best:9.1f}x faster than csv")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,80 @@
+# Memory held per cached record: the dicts the storage layer used to build
+# against the __slots__ classes in pages/records.py, for each table, plus
+# the time to parse the rows.
+#
+#   python -m benchmarks.bench_record_memory [rows]
+
+import sys
+import time
+import contextlib
+import random
+import tracemalloc
+from pages import records, storage
+
+
+def make_rows(table, count, seed=1):
+    # string rows as csv.DictReader yields them
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        if table == 'routes':
+            yield {'id': str(i), 'start_location': f"Building {rng.randrange(200)}", 'end_location': f"Building {rng.randrange(200)}",
+                   'distance_m': str(rng.randint(5, 600)), 'accessible': str(rng.random() < 0.7)}
+        elif table == 'locations':
+            yield {'id': str(i), 'name': f"Room {i}", 'building': f"Building {rng.randrange(200)}",
+                   'floor': str(rng.randrange(6)), 'accessible': str(rng.random() < 0.7)}
+        elif table == 'users':
+            yield {'username': f"user{i}", 'email': f"user{i}@campus.edu", 'role': rng.choice(("admin", "user")),
+                   'password': "%064x" % rng.getrandbits(256)}
+        elif table == 'closures':
+            yield {'notification_id': str(i), 'opened_at': str(1.7e9 + i), 'expires_at': str(1.7e9 + i + 7200)}
+        else:
+            yield {'id': str(i), 'user_id': str(rng.randrange(1, 500)), 'message': f"Route {i} closed for maintenance",
+                   'delivered': str(rng.random() < 0.5)}
+
+
+def parse_dict(table, row):
+    # what storage._parse built before the record classes
+    record = {}
+    for name, kind in storage.TABLES[table]['columns']:
+        value = row.get(name)
+        if kind is bool:
+            record[name] = str(value).lower() in ('true', '1')
+        elif kind is str:
+            record[name] = value if value is not None else ""
+        else:
+            record[name] = kind(value)
+    return record
+
+
+def measure(parse, rows, building=contextlib.nullcontext):
+    # timed untraced first, since tracemalloc slows allocation down
+    start = time.perf_counter()
+    with building():
+        built = [parse(row) for row in rows]
+    elapsed = time.perf_counter() - start
+    del built
+    tracemalloc.start()
+    built = [parse(row) for row in rows]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return size, elapsed
+
+
+def main(count=1000000):
+    print(f"{count} records per table")
+    print(f"{'table':<14}{'dict B/rec':>12}{'slots B/rec':>13}{'saved':>8}{'dict parse':>12}{'slots parse':>13}")
+    for table in storage.TABLES:
+        # the rows and their strings exist before either parse, so only the
+        # records and the values they create are counted
+        rows = list(make_rows(table, count))
+        before, before_time = measure(lambda row: parse_dict(table, row), rows)
+        # storage builds records with the cycle collector paused
+        after, after_time = measure(storage.TABLES[table]['record'].from_row, rows, records.bulk)
+        del rows
+        print(f"{table:<14}{before / count:>12.0f}{after / count:>13.0f}{1 - after / before:>8.0%}"
+              f"{before_time:>11.2f}s{after_time:>12.2f}s")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,78 @@
+# Compare patching the all-pairs route table after a single route edit with
+# rebuilding it from scratch.
+#
+#   python -m benchmarks.bench_route_table [side] [edits]
+
+import sys
+import time
+import random
+from pages import route_graph, route_table
+
+
+def campus(side, seed=1):
+    rng = random.Random(seed)
+    routes = []
+    for x in range(side):
+        for y in range(side):
+            for dx, dy in ((1, 0), (0, 1)):
+                if x + dx < side and y + dy < side:
+                    d = rng.randint(5, 60)
+                    for a, b in (((x, y), (x + dx, y + dy)), ((x + dx, y + dy), (x, y))):
+                        routes.append({
+                            'id': len(routes) + 1,
+                            'start_location': f"B{a[0]}-{a[1]}",
+                            'end_location': f"B{b[0]}-{b[1]}",
+                            'distance_m': d,
+                            'accessible': True
+                        })
+    return routes
+
+
+def main(side=30, edits=20):
+    rng = random.Random(2)
+    graph = route_graph.RouteGraph(campus(side))
+    print(f"{len(graph.names)} locations, {graph.edge_count} routes")
+
+    start = time.perf_counter()
+    table = route_table.RouteTable(graph)
+    full = time.perf_counter() - start
+    print(f"full rebuild:            {full * 1000:9.1f} ms")
+
+    timings = {'insert': [], 'delete': [], 'longer': []}
+    next_id = graph.edge_count + 1
+    for _ in range(edits):
+        a, b = rng.sample(graph.names, 2)
+        route = {'id': next_id, 'start_location': a, 'end_location': b,
+                 'distance_m': rng.randint(5, 60), 'accessible': True}
+        next_id += 1
+        graph.add_route(route)
+        start = time.perf_counter()
+        table.insert_edge(*graph.route(route['id']))
+        timings['insert'].append(time.perf_counter() - start)
+
+        route_id = rng.choice(graph.to_records())['id']
+        old = graph.remove_route(route_id)
+        start = time.perf_counter()
+        table.remove_edge(*old)
+        timings['delete'].append(time.perf_counter() - start)
+
+        route_id = rng.choice(graph.to_records())['id']
+        u, edge = graph.route(route_id)
+        longer = {'id': route_id, 'start_location': graph.names[u], 'end_location': graph.names[edge[0]],
+                  'distance_m': edge[1] * 2, 'accessible': True}
+        graph.update_route(longer)
+        start = time.perf_counter()
+        table.remove_edge(u, edge)
+        table.insert_edge(*graph.route(route_id))
+        timings['longer'].append(time.perf_counter() - start)
+
+    for name, values in timings.items():
+        mean = sum(values) / len(values)
+        print(f"patch {name:<8} (mean):     {mean * 1000:9.1f} ms   {full / mean:7.1f}x faster")
+
+    check = route_table.RouteTable(graph)
+    print("patched table matches rebuild:", bool((check.dist == table.dist).all()))
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,73 @@
+# Search-box queries over a large notifications table: the trigram index
+# in pages/search_index.py against the scan the pages used to do.
+#
+#   python -m benchmarks.bench_search_index [notifications]
+
+import os
+import csv
+import sys
+import time
+import random
+import shutil
+import tempfile
+import resource
+
+QUERIES = ["gym", "library closed", "lecture hall a", "route 4711", "maintenance", "no such words"]
+
+
+def write_notifications(path, count, seed=1):
+    rng = random.Random(seed)
+    places = ["Gym", "Library", "Cafeteria", "Lecture Hall A", "Lecture Hall B"] + [f"Building {i}" for i in range(200)]
+    events = ["closed for maintenance", "reopened", "route updated", "accessible entrance closed", "crowded"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "user_id", "message", "delivered"])
+        for i in range(1, count + 1):
+            message = f"{rng.choice(places)} {rng.choice(events)} (route {rng.randrange(10000)})"
+            writer.writerow([i, rng.randrange(1, 500), message, rng.random() < 0.5])
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(count=1_000_000):
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        os.mkdir("data")
+        write_notifications("data/notification.csv", count)
+        from pages import repository, storage
+
+        records = storage.get_storage().records('notifications')
+        # the first add seeds the id sequence from the table; keep it out of the timing
+        repository.add_notification("warm up")
+        before = rss_mb()
+        start = time.perf_counter()
+        repository.search('notifications', "gym")
+        print(f"{count} notifications: index built in {time.perf_counter() - start:.1f} s, "
+              f"peak RSS +{rss_mb() - before:.0f} MB")
+
+        print(f"{'query':<18}{'matches':>9}{'scan ms':>10}{'index ms':>10}")
+        for query in QUERIES:
+            start = time.perf_counter()
+            scanned = [n for n in records if any(query in str(v).lower() for v in n.values())]
+            scan = time.perf_counter() - start
+            start = time.perf_counter()
+            found = repository.search('notifications', query)
+            indexed = time.perf_counter() - start
+            assert found == scanned, query
+            print(f"{query:<18}{len(found):>9}{scan * 1000:>10.1f}{indexed * 1000:>10.1f}")
+
+        start = time.perf_counter()
+        added = repository.add_notification("Observatory closed for maintenance")
+        found = repository.search('notifications', "observatory")
+        print(f"add + search after it: {(time.perf_counter() - start) * 1000:.1f} ms, found {[n['id'] for n in found] == [added]}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
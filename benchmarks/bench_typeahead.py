@@ -0,0 +1,63 @@
+# Route Finder dropdowns: the options the layout used to ship for every
+# location against the server-side typeahead in pages/catalogue.py.
+#
+#   python -m benchmarks.bench_typeahead [locations]
+
+import os
+import csv
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+
+QUERIES = ["b", "building 12", "room 7", "hall", "lib", "zzz"]
+LIMIT = 20
+
+
+def write_routes(path, locations, seed=1):
+    rng = random.Random(seed)
+    names = [f"Building {i // 10} Room {i % 10}" for i in range(locations - 2)] + ["Library", "Lecture Hall A"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "start_location", "end_location", "distance_m", "accessible"])
+        for i, name in enumerate(names, start=1):
+            writer.writerow([i, name, rng.choice(names), rng.randint(5, 600), rng.random() < 0.7])
+
+
+def main(locations=50000):
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        os.mkdir("data")
+        write_routes("data/routes.csv", locations)
+        from pages import catalogue
+
+        names = catalogue.names('routes')
+        payload = len(json.dumps([{'label': n, 'value': n} for n in names])) * 3
+        print(f"{len(names)} locations: full options in the layout {payload / 1e6:.1f} MB (three dropdowns)")
+
+        start = time.perf_counter()
+        catalogue.complete("", 'routes', LIMIT)
+        print(f"completion keys built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        print(f"{'query':<14}{'scan ms':>9}{'typeahead ms':>14}{'bytes':>8}")
+        for query in QUERIES:
+            start = time.perf_counter()
+            scanned = [n for n in names if query in n.lower()][:LIMIT]
+            scan = time.perf_counter() - start
+            start = time.perf_counter()
+            found = catalogue.complete(query, 'routes', LIMIT)
+            typeahead = time.perf_counter() - start
+            size = len(json.dumps([{'label': n, 'value': n} for n in found]))
+            print(f"{query:<14}{scan * 1000:>9.2f}{typeahead * 1000:>14.3f}{size:>8}")
+            assert len(found) == len(scanned) or len(found) == LIMIT, query
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
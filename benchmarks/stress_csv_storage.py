@@ -0,0 +1,143 @@
+# Hammer the CSV storage from several processes at once, the way gunicorn
+# workers do, and check that no write is lost and no reader ever sees a torn
+# file. Runs against a scratch copy of data/.
+#
+#   python -m benchmarks.stress_csv_storage [writers] [ops] [readers]
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import multiprocessing
+
+DATA_DIR = os.path.abspath("data")
+
+
+def writer(workdir, worker, ops, results):
+    os.chdir(workdir)
+    from pages import repository, storage
+
+    rng = random.Random(worker)
+    routes = {}
+    locations = {}
+    messages = []
+    reserved = []
+    for k in range(ops):
+        op = rng.random()
+        if op < 0.3 or not routes:
+            route = repository.add_route({
+                'id': None,
+                'start_location': f"W{worker}-{k}",
+                'end_location': "Library",
+                'distance_m': float(k),
+                'accessible': True
+            })
+            routes[route['id']] = route['distance_m']
+        elif op < 0.5:
+            route_id = rng.choice(list(routes))
+            distance = float(1000 + k)
+            repository.update_route({
+                'id': route_id,
+                'start_location': f"W{worker}-moved",
+                'end_location': "Library",
+                'distance_m': distance,
+                'accessible': False
+            })
+            routes[route_id] = distance
+        elif op < 0.6:
+            route_id = rng.choice(list(routes))
+            repository.delete_route(route_id)
+            routes.pop(route_id)
+        elif op < 0.65:
+            reserved.extend(storage.get_storage().reserve_ids('routes', rng.randint(1, 50)))
+        elif op < 0.8:
+            location = repository.add_location({
+                'id': None, 'name': f"W{worker}-{k}", 'building': "Stress", 'floor': k % 5, 'accessible': True
+            })
+            locations[location['id']] = location['name']
+        else:
+            message = f"W{worker}-{k}"
+            repository.add_notification(message)
+            messages.append(message)
+    results.put((worker, routes, locations, messages, reserved))
+
+
+def reader(workdir, stop, results):
+    os.chdir(workdir)
+    from pages import storage
+
+    reads = 0
+    torn = []
+    while not stop.is_set():
+        # a fresh backend each time, so every read really parses the files
+        backend = storage.CsvStorage()
+        for table in ('routes', 'locations', 'notifications'):
+            try:
+                records = backend.records(table)
+                if any(None in r.values() for r in records):
+                    torn.append(table)
+            except Exception as e:
+                torn.append(f"{table}: {e!r}")
+        reads += 1
+    results.put(('reader', reads, torn))
+
+
+def main(writers=8, ops=200, readers=2):
+    workdir = tempfile.mkdtemp()
+    shutil.copytree(DATA_DIR, os.path.join(workdir, "data"))
+    for name in os.listdir(os.path.join(workdir, "data")):
+        if not name.endswith(".csv"):
+            os.remove(os.path.join(workdir, "data", name))
+
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    reader_procs = [multiprocessing.Process(target=reader, args=(workdir, stop, results)) for _ in range(readers)]
+    writer_procs = [multiprocessing.Process(target=writer, args=(workdir, w, ops, results)) for w in range(writers)]
+
+    start = time.perf_counter()
+    for p in reader_procs + writer_procs:
+        p.start()
+    written = [results.get() for _ in writer_procs]
+    elapsed = time.perf_counter() - start
+    stop.set()
+    read = [results.get() for _ in reader_procs]
+    for p in reader_procs + writer_procs:
+        p.join()
+
+    os.chdir(workdir)
+    from pages import storage
+    backend = storage.CsvStorage()
+    routes = {r['id']: r for r in backend.records('routes')}
+    locations = {r['id']: r for r in backend.records('locations')}
+    notifications = [n['message'] for n in backend.records('notifications')]
+
+    lost = []
+    handed_out = []
+    for worker, own_routes, own_locations, messages, reserved in written:
+        handed_out.extend(own_routes)
+        handed_out.extend(reserved)
+        for route_id, distance in own_routes.items():
+            if route_id not in routes or routes[route_id]['distance_m'] != distance:
+                lost.append(f"route {route_id} of writer {worker}")
+        for location_id, name in own_locations.items():
+            if locations.get(location_id, {}).get('name') != name:
+                lost.append(f"location {location_id} of writer {worker}")
+        lost.extend(f"notification {m!r}" for m in messages if m not in notifications)
+    duplicates = len(backend.records('notifications')) - len({n['id'] for n in backend.records('notifications')})
+    # route ids inserted or reserved by different writers must never overlap
+    duplicates += len(handed_out) - len(set(handed_out))
+
+    total_ops = writers * ops
+    print(f"{writers} writers x {ops} ops, {readers} readers: {elapsed:.1f} s ({total_ops / elapsed:.0f} ops/s)")
+    print(f"reads: {sum(r[1] for r in read)}, torn reads: {sum(len(r[2]) for r in read)}")
+    print(f"lost updates: {len(lost)}, duplicate ids: {duplicates}")
+    for line in lost[:10] + [t for r in read for t in r[2]][:10]:
+        print("  ", line)
+    shutil.rmtree(workdir)
+    return 0 if not lost and not duplicates and not any(r[2] for r in read) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
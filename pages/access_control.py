@@ -1,23 +1,15 @@
 import dash
 from dash import html, dcc, Input, Output, State, callback
-import pandas as pd
 import dash_bootstrap_components as dbc
+from pages import catalogue, route_graph, routing, closures
 
 BLUE = "#0B63C5"
 GREEN = "#28a745"
 RED = "#dc3545"
-
-def load_routes():
-    try:
-        df = pd.read_csv("data/routes.csv")
-        return df
-    except:
-        return pd.DataFrame(columns=['id', 'start_location', 'end_location', 'distance_m', 'accessible'])
+# location options sent to a dropdown per keystroke
+TYPEAHEAD_LIMIT = 20
 
 def layout():
-    df = load_routes()
-    locations = sorted(set(df['start_location'].tolist() + df['end_location'].tolist())) if not df.empty else []
-
     return dbc.Container([
         html.H1("📍 Campus Route Finder", className="my-4", style={'color': BLUE}),
 
@@ -31,7 +23,7 @@ def layout():
                         html.Label("From", className="fw-bold"),
                         dcc.Dropdown(
                             id='start-location',
-                            options=[{'label': loc, 'value': loc} for loc in locations],
+                            options=[],
                             placeholder='Select start location...'
                         )
                     ], md=6),
@@ -39,7 +31,7 @@ def layout():
                         html.Label("To", className="fw-bold"),
                         dcc.Dropdown(
                             id='end-location',
-                            options=[{'label': loc, 'value': loc} for loc in locations],
+                            options=[],
                             placeholder='Select destination...'
                         )
                     ], md=6)
@@ -63,6 +55,43 @@ def layout():
             ])
         ], className="mb-4 shadow-sm"),
 
+        dbc.Card([
+            dbc.CardBody([
+                html.H3("What's Nearby", className="mb-4", style={'color': BLUE}),
+
+                dbc.Row([
+                    dbc.Col([
+                        html.Label("From", className="fw-bold"),
+                        dcc.Dropdown(
+                            id='reach-start',
+                            options=[],
+                            placeholder='Select start location...'
+                        )
+                    ], md=5),
+                    dbc.Col([
+                        html.Label("Within (m)", className="fw-bold"),
+                        dcc.Input(id='reach-distance', type='number', min=0, value=200, className="form-control")
+                    ], md=3),
+                    dbc.Col([
+                        html.Label("Filters", className="fw-bold"),
+                        dcc.Checklist(
+                            id='reach-accessible',
+                            options=[{'label': ' Accessible only', 'value': 'yes'}],
+                            value=[]
+                        )
+                    ], md=4)
+                ], className="mb-3"),
+
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Button("Show Reachable", id="reach-btn", color="primary", className="w-100")
+                    ], md={'size': 4, 'offset': 8})
+                ], className="mb-3"),
+
+                html.Div(id='reach-result')
+            ])
+        ], className="mb-4 shadow-sm"),
+
        
         dbc.Card([
             dbc.CardBody([
@@ -83,8 +112,44 @@ def layout():
         ], className="shadow-sm")
     ], fluid=True)
 
-def generate_table(df):
-    if df.empty:
+def _location_options(search, value):
+    # server-side typeahead over the route locations; the current selection
+    # stays listed so the dropdown can still show it
+    names = catalogue.complete(search, 'routes', TYPEAHEAD_LIMIT)
+    if value and value not in names:
+        names = [value] + names
+    return [{'label': name, 'value': name} for name in names]
+
+
+@callback(
+    Output('start-location', 'options'),
+    Input('start-location', 'search_value'),
+    State('start-location', 'value')
+)
+def start_options(search, value):
+    return _location_options(search, value)
+
+
+@callback(
+    Output('end-location', 'options'),
+    Input('end-location', 'search_value'),
+    State('end-location', 'value')
+)
+def end_options(search, value):
+    return _location_options(search, value)
+
+
+@callback(
+    Output('reach-start', 'options'),
+    Input('reach-start', 'search_value'),
+    State('reach-start', 'value')
+)
+def reach_options(search, value):
+    return _location_options(search, value)
+
+
+def generate_table(routes):
+    if not routes:
         return html.P("No routes data available.", className='text-muted')
 
     header = html.Tr([
@@ -96,7 +161,7 @@ def generate_table(df):
     ])
 
     rows = []
-    for i, row in df.iterrows():
+    for row in routes:
         accessible_bool = bool(row['accessible'])
         accessible_text = "✅ Yes" if accessible_bool else "❌ No"
         accessible_color = GREEN if accessible_bool else RED
@@ -126,21 +191,13 @@ def generate_table(df):
     Input('filter-accessible', 'value')
 )
 def update_table(search_text, filter_value):
-    df = load_routes()
-    if df.empty:
-        return html.P("No routes data available.", className='text-muted')
+    graph = route_graph.get_graph('yes' in filter_value)
+    if not search_text:
+        return generate_table(graph.to_records())
 
-    if 'yes' in filter_value:
-        df = df[df['accessible'] == True]
-
-    if search_text:
-        search_text = search_text.lower()
-        df = df[
-            df['start_location'].str.lower().str.contains(search_text) |
-            df['end_location'].str.lower().str.contains(search_text)
-        ]
-
-    return generate_table(df)
+    # match the text against the location names, then pick their routes
+    search_text = search_text.lower()
+    return generate_table(graph.to_records([name for name in graph.names if search_text in name.lower()]))
 
 @callback(
     Output('route-result', 'children'),
@@ -156,43 +213,83 @@ def find_route(n_clicks, start, end, filter_value):
     if not start or not end:
         return html.P("Please select both start and end locations.", className='text-danger fw-bold')
 
-    df = load_routes()
-    if df.empty:
+    graph = route_graph.get_graph()
+    if not graph.edge_count:
         return html.P("No routes data available.", className='text-danger')
 
-    if 'yes' in filter_value:
-        df = df[df['accessible'] == True]
-
-    direct_routes = df[(df['start_location'] == start) & (df['end_location'] == end)]
-    if direct_routes.empty:
+    accessible_only = 'yes' in filter_value
+    result = routing.find_path(start, end, accessible_only)
+    if result is None:
         return html.Div([
-            html.H4(f"❌ No direct route found from {start} to {end}", className='text-danger mb-2'),
+            html.H4(f"❌ No route found from {start} to {end}", className='text-danger mb-2'),
             html.P("Try selecting different locations or remove the 'accessible only' filter.", className='text-muted')
         ])
 
-    shortest_idx = direct_routes['distance_m'].idxmin()
-    shortest_route = direct_routes.loc[shortest_idx]
+    alternatives = routing.find_alternatives(start, end, accessible_only)
+    closed = [c for c in closures.active() if c['location'] in (start, end)]
 
     return html.Div([
         html.H4(f"✅ Route Found: {start} → {end}", className='text-success mb-3'),
+        html.Div([
+            html.P(f"⚠️ {c['location']} is currently closed: {c['reason']}", className='text-warning fw-bold mb-1')
+            for c in closed
+        ], className='mb-2'),
 
         dbc.Card([
             dbc.CardBody([
                 html.H5("🏆 Shortest Route", style={'color': BLUE}),
-                html.P(f"📍 Route ID: {shortest_route['id']}"),
-                html.P(f"📏 Distance: {shortest_route['distance_m']} meters"),
-                html.P(f"♿ Accessible: {'✅ Yes' if shortest_route['accessible'] else '❌ No'}"),
+                html.P(f"🧭 Path: {' → '.join(result['locations'])}"),
+                html.P(f"📏 Distance: {result['distance_m']:g} meters"),
+                html.P(f"🔁 Legs: {len(result['legs'])}"),
+                html.P(f"♿ Accessible: {'✅ Yes' if result['accessible'] else '❌ No'}"),
+                html.Ul([
+                    html.Li([
+                        html.Span(f"Route {leg['id']}: ", className='fw-bold'),
+                        html.Span(f"{leg['start_location']} → {leg['end_location']} ({leg['distance_m']:g}m)"),
+                        html.Span(f" ({'✅ Accessible' if leg['accessible'] else '❌ Not Accessible'})",
+                                  style={'color': GREEN if leg['accessible'] else RED, 'marginLeft': '10px'})
+                    ], className='p-1') for leg in result['legs']
+                ], className='list-unstyled mb-0')
             ])
         ], className="mb-3 border-start border-4",
-           style={'borderColor': GREEN if shortest_route['accessible'] else RED}),
+           style={'borderColor': GREEN if result['accessible'] else RED}),
 
         html.H5("All Available Routes:", className='mb-2'),
         html.Ul([
             html.Li([
-                html.Span(f"Route {row['id']}: ", className='fw-bold'),
-                html.Span(f"{row['distance_m']}m"),
-                html.Span(f" ({'✅ Accessible' if bool(row['accessible']) else '❌ Not Accessible'})",
-                          style={'color': GREEN if bool(row['accessible']) else RED, 'marginLeft': '10px'})
-            ], className='p-2 bg-light mb-1') for _, row in direct_routes.iterrows()
+                html.Span(f"Option {i}: ", className='fw-bold'),
+                html.Span(f"{' → '.join(alt['locations'])} — {alt['distance_m']:g}m"),
+                html.Span(f" ({'✅ Accessible' if alt['accessible'] else '❌ Not Accessible'})",
+                          style={'color': GREEN if alt['accessible'] else RED, 'marginLeft': '10px'})
+            ], className='p-2 bg-light mb-1') for i, alt in enumerate(alternatives, start=1)
+        ], className='list-unstyled')
+    ])
+
+
+@callback(
+    Output('reach-result', 'children'),
+    Input('reach-btn', 'n_clicks'),
+    State('reach-start', 'value'),
+    State('reach-distance', 'value'),
+    State('reach-accessible', 'value')
+)
+def find_reachable(n_clicks, start, max_distance, filter_value):
+    if not n_clicks:
+        return ""
+
+    if not start or max_distance is None or max_distance < 0:
+        return html.P("Please select a start location and a distance.", className='text-danger fw-bold')
+
+    reachable = [(name, d) for name, d in routing.find_reachable(start, max_distance, 'yes' in filter_value) if name != start]
+    if not reachable:
+        return html.P(f"❌ Nothing reachable within {max_distance:g} m of {start}.", className='text-danger')
+
+    return html.Div([
+        html.H5(f"✅ {len(reachable)} location(s) within {max_distance:g} m of {start}", className='text-success mb-2'),
+        html.Ul([
+            html.Li([
+                html.Span(name, className='fw-bold'),
+                html.Span(f" — {d:g}m", className='text-muted')
+            ], className='p-2 bg-light mb-1') for name, d in reachable
         ], className='list-unstyled')
     ])
@@ -2,41 +2,15 @@ import matplotlib
 matplotlib.use("Agg")
 
 import matplotlib.pyplot as plt
-import csv
 import collections
 import io
 import base64
+import numpy as np
 from dash import html
+from pages import catalogue, columnar, repository
 
-
-def load_locations():
-    locations = []
-    with open("data/locations.csv", 'r', newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            locations.append({
-                'id': int(row['id']),
-                'name': row['name'],
-                'building': row['building'],
-                'floor': int(row['floor']),
-                'accessible': row['accessible'].lower() == 'true'
-            })
-    return locations
-
-
-def load_routes():
-    routes = []
-    with open("data/routes.csv", 'r', newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            routes.append({
-                'id': int(row['id']),
-                'start_location': row['start_location'],
-                'end_location': row['end_location'],
-                'distance_m': float(row['distance_m']),
-                'accessible': row['accessible'].lower() == 'true'
-            })
-    return routes
+# rendered charts, kept until the routes or locations version moves
+_rendered = (None, None)
 
 
 def fig_to_base64():
@@ -49,7 +23,7 @@ def fig_to_base64():
 
 
 def bar_visits_per_building(locations):
-    counts = collections.Counter([loc['building'] for loc in locations])
+    counts = collections.Counter(locations['building'].tolist())
     plt.figure(figsize=(6, 4))
     plt.bar(counts.keys(), counts.values())
     plt.title("Visits per Building")
@@ -59,7 +33,7 @@ def bar_visits_per_building(locations):
 
 
 def pie_visits_per_building(locations):
-    counts = collections.Counter([loc['building'] for loc in locations])
+    counts = collections.Counter(locations['building'].tolist())
     plt.figure(figsize=(6, 4))
     plt.pie(counts.values(), labels=counts.keys(), autopct="%1.1f%%")
     plt.title("Visit Share by Building")
@@ -67,7 +41,7 @@ def pie_visits_per_building(locations):
 
 
 def line_visits_over_floors(locations):
-    counts = collections.Counter([loc['floor'] for loc in locations])
+    counts = collections.Counter(locations['floor'].tolist())
     floors = sorted(counts.keys())
     values = [counts[f] for f in floors]
     plt.figure(figsize=(6, 4))
@@ -79,12 +53,14 @@ def line_visits_over_floors(locations):
 
 
 def heatmap_routes(routes):
-    locations = sorted(set([r['start_location'] for r in routes] + [r['end_location'] for r in routes]))
-    matrix = [[0 for _ in locations] for _ in locations]
-    for r in routes:
-        i = locations.index(r['start_location'])
-        j = locations.index(r['end_location'])
-        matrix[i][j] += 1
+    # endpoints are catalogue ids; only locations that appear on a route,
+    # ordered by name
+    used = sorted(np.union1d(routes['start_location'], routes['end_location']).tolist(), key=catalogue.name)
+    position = np.zeros(catalogue.size(), dtype=np.int64)
+    position[used] = np.arange(len(used))
+    matrix = np.zeros((len(used), len(used)), dtype=np.int64)
+    np.add.at(matrix, (position[routes['start_location']], position[routes['end_location']]), 1)
+    locations = [catalogue.name(i) for i in used]
     plt.figure(figsize=(6, 4))
     plt.imshow(matrix, cmap="Blues")
     plt.colorbar(label="Route Usage")
@@ -95,8 +71,9 @@ def heatmap_routes(routes):
 
 
 def scatter_distance_vs_route(routes):
+    distances = routes['distance_m']
     plt.figure(figsize=(6, 4))
-    plt.scatter([r['distance_m'] for r in routes], list(range(len(routes))))
+    plt.scatter(distances, np.arange(len(distances)))
     plt.title("Route Distance Distribution")
     plt.xlabel("Distance (meters)")
     plt.ylabel("Route Index")
@@ -105,7 +82,7 @@ def scatter_distance_vs_route(routes):
 
 def histogram_distance(routes):
     plt.figure(figsize=(6, 4))
-    plt.hist([r['distance_m'] for r in routes], bins=5)
+    plt.hist(routes['distance_m'], bins=5)
     plt.title("Route Distance Histogram")
     plt.xlabel("Distance (meters)")
     plt.ylabel("Frequency")
@@ -113,8 +90,18 @@ def histogram_distance(routes):
 
 
 def layout():
-    locations = load_locations()
-    routes = load_routes()
+    global _rendered
+    key = (repository.stamp('locations'), repository.stamp('routes'))
+    if _rendered[0] != key:
+        _rendered = (key, render())
+    return _rendered[1]
+
+
+def render():
+    # each chart group reads just the columns it plots
+    locations = columnar.read('locations', ['building', 'floor'])
+    routes = columnar.read('routes', ['distance_m'])
+    routes.update(columnar.read_ids('routes', ['start_location', 'end_location']))
 
     return html.Div(
         style={"maxWidth": "1100px", "margin": "0 auto"},
@@ -0,0 +1,58 @@
+import os
+import json
+
+
+class AppendLog:
+    # Line-oriented JSON log. Every entry goes out as a single O_APPEND write,
+    # and readers resume from the byte offset they last stopped at, so both
+    # appending and catching up cost the same however long the history is.
+    def __init__(self, path):
+        self.path = path
+
+    def size(self):
+        try:
+            return os.stat(self.path).st_size
+        except OSError:
+            return 0
+
+    def append(self, entry):
+        return self.extend([entry])
+
+    def extend(self, entries):
+        # returns the (start, end) byte range the entries landed at; they go
+        # out in one write, so a batch costs about the same as a single entry
+        line = b"".join((json.dumps(e, separators=(',', ':')) + "\n").encode("utf-8") for e in entries)
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                # a previous writer died mid-line: start on a fresh one
+                line = b"\n" + line
+            os.write(fd, line)
+            end = os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+        return end - len(line), end
+
+    def read(self, offset=0, end=None):
+        # complete entries between offset and end, and the offset just past them
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return [], offset
+        with f:
+            f.seek(offset)
+            data = f.read() if end is None else f.read(max(0, end - offset))
+        cut = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:cut].splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # blank, or the torn tail of an interrupted append
+                continue
+        return entries, offset + cut
+
+    def truncate(self):
+        with open(self.path, "wb"):
+            pass
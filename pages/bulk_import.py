@@ -0,0 +1,155 @@
+import io
+import sys
+import csv
+import time
+import base64
+import numpy as np
+from pages import notification_queue, repository, storage
+
+# Streaming CSV import for onboarding a whole campus at once. The file is
+# read CHUNK_ROWS rows at a time; each chunk is type-converted and checked
+# column by column with numpy, and its valid rows go to the store in one
+# insert_many call, so memory stays bounded by the chunk size whatever the
+# file size. Ids always come from the table's sequence; an id column in the
+# file is ignored.
+CHUNK_ROWS = 10000
+MAX_ERRORS = 100
+TRUE_WORDS = ("true", "1", "yes", "y")
+FALSE_WORDS = ("false", "0", "no", "n")
+
+IMPORTERS = {
+    'routes': repository.add_routes,
+    'locations': repository.add_locations
+}
+
+
+def _columns(table):
+    return [(name, kind) for name, kind in storage.TABLES[table]['columns'] if name != 'id']
+
+
+def _convert(kind, raw):
+    # (values, bad rows mask, message for the bad rows)
+    if kind is str:
+        return raw, raw == "", "is required"
+    if kind is bool:
+        lowered = np.char.lower(raw)
+        values = np.isin(lowered, TRUE_WORDS)
+        return values, ~(values | np.isin(lowered, FALSE_WORDS)), "must be true or false"
+    try:
+        values = raw.astype(np.float64)
+        bad = np.zeros(len(raw), dtype=bool)
+    except ValueError:
+        # some row does not parse: convert one by one to find which
+        values = np.zeros(len(raw), dtype=np.float64)
+        bad = np.zeros(len(raw), dtype=bool)
+        for i, value in enumerate(raw.tolist()):
+            try:
+                values[i] = float(value)
+            except ValueError:
+                bad[i] = True
+    if kind is int:
+        bad |= ~np.isfinite(values) | (values != np.round(values))
+        return np.where(bad, 0, values).astype(np.int64), bad, "must be a whole number"
+    return values, bad | ~np.isfinite(values), "must be a number"
+
+
+def _validate(table, positions, rows):
+    # -> (valid records, [(line, message)] for the rejected rows)
+    problems = []
+    columns = {}
+    invalid = {}
+    short = np.array([len(row) for row in rows]) < len(positions)
+    if short.any():
+        problems.append((short, "missing fields"))
+    for name, kind in _columns(table):
+        index = positions[name]
+        raw = np.char.strip(np.array([row[index] if index < len(row) else "" for row in rows], dtype=str))
+        values, bad, message = _convert(kind, raw)
+        problems.append((bad, "%s %s" % (name, message)))
+        columns[name] = values
+        invalid[name] = bad
+
+    if table == 'routes':
+        problems.append(((columns['distance_m'] <= 0) & ~invalid['distance_m'], "distance_m must be positive"))
+        same = (columns['start_location'] == columns['end_location']) & ~invalid['start_location']
+        problems.append((same, "start and end are the same location"))
+
+    rejected = np.logical_or.reduce([bad for bad, _ in problems])
+    names = list(columns)
+    valid = ~rejected
+    records = [
+        {'id': None, **dict(zip(names, values))}
+        for values in zip(*(columns[name][valid].tolist() for name in names))
+    ]
+    errors = [(i, "; ".join(message for bad, message in problems if bad[i])) for i in np.flatnonzero(rejected).tolist()]
+    return records, errors
+
+
+def import_csv(table, source, chunk_rows=CHUNK_ROWS, notify=True):
+    # source is a path or an open text stream; returns a summary dict
+    if isinstance(source, str):
+        with open(source, "r", newline="", encoding="utf-8-sig") as f:
+            return import_csv(table, f, chunk_rows, notify)
+
+    started = time.perf_counter()
+    summary = {'table': table, 'rows': 0, 'imported': 0, 'rejected': 0, 'errors': [], 'seconds': 0.0}
+    reader = csv.reader(source)
+    header = [h.strip().lower() for h in next(reader, [])]
+    missing = [name for name, _ in _columns(table) if name not in header]
+    if missing:
+        summary['errors'].append((1, "missing columns: " + ", ".join(missing)))
+        return summary
+    positions = {name: header.index(name) for name, _ in _columns(table)}
+
+    chunk = []
+    lines = []
+    for row in reader:
+        if not any(field.strip() for field in row):
+            continue
+        chunk.append(row)
+        lines.append(reader.line_num)
+        if len(chunk) >= chunk_rows:
+            _import_chunk(table, positions, chunk, lines, summary)
+            chunk = []
+            lines = []
+    if chunk:
+        _import_chunk(table, positions, chunk, lines, summary)
+
+    summary['seconds'] = time.perf_counter() - started
+    if notify and summary['imported']:
+        message = "Bulk import: %d %s added" % (summary['imported'], table)
+        if summary['rejected']:
+            message += ", %d rows rejected" % summary['rejected']
+        notification_queue.enqueue(message)
+    return summary
+
+
+def _import_chunk(table, positions, rows, lines, summary):
+    records, errors = _validate(table, positions, rows)
+    if records:
+        IMPORTERS[table](records)
+    summary['rows'] += len(rows)
+    summary['imported'] += len(records)
+    summary['rejected'] += len(errors)
+    room = MAX_ERRORS - len(summary['errors'])
+    summary['errors'].extend((lines[i], message) for i, message in errors[:max(0, room)])
+
+
+def import_upload(table, contents):
+    # contents is a dcc.Upload data URL ("data:<type>;base64,<payload>")
+    payload = base64.b64decode(contents.split(",", 1)[-1])
+    return import_csv(table, io.TextIOWrapper(io.BytesIO(payload), encoding="utf-8-sig", newline=""))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in IMPORTERS:
+        print("usage: python -m pages.bulk_import {routes|locations} file.csv")
+        sys.exit(1)
+    result = import_csv(sys.argv[1], sys.argv[2])
+    print("%d rows read, %d imported, %d rejected in %.1f s" % (result['rows'], result['imported'], result['rejected'], result['seconds']))
+    for line, message in result['errors']:
+        print("  line %d: %s" % (line, message))
+    unwritten = notification_queue.flush(notification_queue.SHUTDOWN_TIMEOUT)
+    if unwritten:
+        print("%d notifications could not be written" % unwritten, file=sys.stderr)
+    sys.exit(1 if result['rejected'] or not result['rows'] or unwritten else 0)
@@ -0,0 +1,158 @@
+import re
+import bisect
+import threading
+import numpy as np
+from pages import repository
+
+# One interned catalogue of location names shared by routes and locations.
+# routes.csv names its endpoints in free text and locations.csv keeps names
+# of its own, so rather than every consumer building name sets from the
+# records, the catalogue gives each name either table uses a dense integer
+# id and keeps per-table use counts. Ids are handed out in the order names
+# are first seen and never change for the life of the process, so id arrays
+# and lookup tables built from them stay valid.
+#
+# A table is counted in full the first time it is asked about, or when its
+# stamp shows another process wrote it; saves made here are applied to the
+# counts through record_changed().
+SOURCES = {
+    'locations': ('name',),
+    'routes': ('start_location', 'end_location')
+}
+READERS = {
+    'locations': repository.read_locations,
+    'routes': repository.read_routes
+}
+
+_lock = threading.RLock()
+_names = []
+_index = {}
+_uses = {table: [] for table in SOURCES}
+_stamps = {}
+# sorted names in use, per table (None for either), and the completion
+# keys built from them; both dropped on every change
+_sorted = {}
+_completions = {}
+
+
+def _intern(name):
+    location_id = _index.get(name)
+    if location_id is None:
+        location_id = _index[name] = len(_names)
+        _names.append(name)
+        for counts in _uses.values():
+            counts.append(0)
+    return location_id
+
+
+def _recount(table, stamp):
+    counts = _uses[table] = [0] * len(_names)
+    for record in READERS[table]():
+        for column in SOURCES[table]:
+            counts[_intern(record[column])] += 1
+    _stamps[table] = stamp
+    _sorted.clear()
+    _completions.clear()
+
+
+def _current(table):
+    stamp = repository.stamp(table)
+    if _stamps.get(table) != stamp:
+        _recount(table, stamp)
+
+
+def intern(name):
+    with _lock:
+        return _intern(name)
+
+
+def ids(names):
+    # catalogue ids for a sequence of names, as an int64 array
+    with _lock:
+        return np.fromiter((_intern(name) for name in names), dtype=np.int64, count=len(names))
+
+
+def name(location_id):
+    return _names[location_id]
+
+
+def id_table():
+    # (names by id, {name: id}): the catalogue's own lists, for callers that
+    # index arrays by id. Both only ever grow; read them, never change them.
+    return _names, _index
+
+
+def size():
+    return len(_names)
+
+
+def names(table=None):
+    # sorted names used by table's records (by either table when None)
+    with _lock:
+        tables = [table] if table else list(SOURCES)
+        for t in tables:
+            _current(t)
+        result = _sorted.get(table)
+        if result is None:
+            used = [i for i in range(len(_names)) if any(_uses[t][i] for t in tables)]
+            result = _sorted[table] = sorted(_names[i] for i in used)
+        return result
+
+
+def _completion_keys(table):
+    # sorted (lowercased name, name) pairs, and the same for every later
+    # word of a name onwards, so "hall" finds "Lecture Hall A"
+    keys = _completions.get(table)
+    if keys is None:
+        whole = []
+        words = []
+        for location in names(table):
+            folded = location.lower()
+            whole.append((folded, location))
+            words.extend((folded[m.start():], location) for m in re.finditer(r'(?<=\s)\S', folded))
+        keys = _completions[table] = (sorted(whole), sorted(words))
+    return keys
+
+
+def complete(text, table=None, limit=20):
+    # up to limit names in use starting with text, then names with a later
+    # word starting with it, ignoring case; a bisect into sorted keys
+    prefix = (text or "").strip().lower()
+    with _lock:
+        names(table)
+        keys = _completion_keys(table)
+    found = []
+    for entries in keys:
+        i = bisect.bisect_left(entries, (prefix,))
+        while i < len(entries) and len(found) < limit and entries[i][0].startswith(prefix):
+            if entries[i][1] not in found:
+                found.append(entries[i][1])
+            i += 1
+    return found
+
+
+def record_changed(table, old, new):
+    # a record of table was added (old None), edited or deleted (new None)
+    # by this thread, just now. The counts take the change only if they
+    # were current up to that write; otherwise something else wrote first
+    # (a bulk import, another worker) and the next read counts again.
+    written = repository.last_write(table)
+    with _lock:
+        if table not in _stamps:
+            return
+        if written is None or _stamps[table] != written[0]:
+            invalidate(table)
+            return
+        for record, step in ((old, -1), (new, 1)):
+            if record is not None:
+                for column in SOURCES[table]:
+                    _uses[table][_intern(record[column])] += step
+        _stamps[table] = written[1]
+        _sorted.clear()
+        _completions.clear()
+
+
+def invalidate(table):
+    # table has changed too much to patch: count it again on the next read
+    with _lock:
+        _stamps.pop(table, None)
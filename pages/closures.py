@@ -0,0 +1,168 @@
+import re
+import time
+import threading
+from pages import catalogue, repository
+
+CLOSURE_MINUTES = 120
+CLOSURE_WORDS = ("closed", "closure", "maintenance", "blocked", "out of service")
+
+# A notification that mentions a closure closes the places it names for
+# CLOSURE_MINUTES from when it was first seen by any worker. That window is
+# kept in the closures table, so restarts and other workers apply the same
+# one instead of starting their own.
+_closures = {}
+_listeners = []
+_notif_cursor = None
+_manual_ids = 0
+_generation = 0
+_lock = threading.RLock()
+
+
+def add_listener(fn):
+    _listeners.append(fn)
+
+
+def _notify(event, closure):
+    global _generation
+    _generation += 1
+    for fn in _listeners:
+        fn(event, closure)
+
+
+def _add(key, location=None, route_id=None, minutes=CLOSURE_MINUTES, reason="", expires_at=None):
+    closure = {
+        'key': key,
+        'location': location,
+        'route_id': route_id,
+        'reason': reason,
+        'expires_at': expires_at if expires_at is not None else time.time() + minutes * 60
+    }
+    with _lock:
+        _closures[key] = closure
+        _notify('added', closure)
+    return closure
+
+
+def close_location(name, minutes=CLOSURE_MINUTES, reason=""):
+    global _manual_ids
+    with _lock:
+        _manual_ids += 1
+        return _add(('manual', _manual_ids), location=name, minutes=minutes, reason=reason)
+
+
+def close_route(route_id, minutes=CLOSURE_MINUTES, reason=""):
+    global _manual_ids
+    with _lock:
+        _manual_ids += 1
+        return _add(('manual', _manual_ids), route_id=int(route_id), minutes=minutes, reason=reason)
+
+
+def reopen(key):
+    with _lock:
+        closure = _closures.pop(key, None)
+        if closure is not None:
+            _notify('removed', closure)
+        return closure
+
+
+def closed_locations_in(message, names):
+    text = message.lower()
+    if not any(word in text for word in CLOSURE_WORDS):
+        return []
+    return [name for name in names if re.search(r'\b' + re.escape(name.lower()) + r'\b', text)]
+
+
+def _windows(notif_ids):
+    # {notification id: expires_at} for notif_ids, opening a window from now
+    # for any not recorded yet; should two workers both record one, the
+    # earliest opening wins
+    windows = {}
+    opened = {}
+    for c in repository.read_closures():
+        nid = c['notification_id']
+        if nid in notif_ids and (nid not in opened or c['opened_at'] < opened[nid]):
+            opened[nid] = c['opened_at']
+            windows[nid] = c['expires_at']
+    missing = sorted(set(notif_ids) - set(windows))
+    if missing:
+        now = time.time()
+        try:
+            repository.add_closures([
+                {'notification_id': nid, 'opened_at': now, 'expires_at': now + CLOSURE_MINUTES * 60} for nid in missing
+            ])
+        except repository.DuplicateKey:
+            # another worker recorded some of them first
+            return _windows(notif_ids)
+        windows.update((nid, now + CLOSURE_MINUTES * 60) for nid in missing)
+    return windows
+
+
+def _sync(mentions, notif_ids):
+    # mentions: {notification id: (message, [closed location names])} for
+    # the notifications in notif_ids that still mention a closure
+    windows = _windows(set(mentions))
+    now = time.time()
+    wanted = {}
+    for nid, (message, locations) in mentions.items():
+        if windows[nid] > now:
+            for name in locations:
+                wanted[('notification', nid, name)] = (name, message, windows[nid])
+    for key in [k for k in _closures if k[0] == 'notification' and k[1] in notif_ids and k not in wanted]:
+        reopen(key)
+    for key, (name, message, expires_at) in wanted.items():
+        if key not in _closures:
+            _add(key, location=name, reason=message, expires_at=expires_at)
+
+
+def _mentions(notifications, names):
+    found = {}
+    for nid, message in notifications:
+        locations = closed_locations_in(message, names) if message is not None else []
+        if locations:
+            found[nid] = (message, locations)
+    return found
+
+
+def _sync_notifications():
+    global _notif_cursor
+    changes, _notif_cursor = repository.tail_notifications(_notif_cursor)
+    if changes is not None:
+        # only the entries appended since the last look
+        if changes:
+            latest = {}
+            for change in changes:
+                if change['op'] == 'delete':
+                    latest[change['key']] = None
+                else:
+                    latest[change['record']['id']] = change['record']['message']
+            _sync(_mentions(latest.items(), _names()), set(latest))
+        return
+
+    notifications = [(n["id"], n["message"]) for n in repository.read_notifications()]
+    ids = {nid for nid, _ in notifications} | {k[1] for k in _closures if k[0] == 'notification'}
+    _sync(_mentions(notifications, _names()), ids)
+
+
+def _names():
+    return catalogue.names()
+
+
+def active():
+    now = time.time()
+    with _lock:
+        _sync_notifications()
+        for key, closure in list(_closures.items()):
+            if closure['expires_at'] <= now:
+                reopen(key)
+        return list(_closures.values())
+
+
+def blocked():
+    current = active()
+    locations = {c['location'] for c in current if c['location'] is not None}
+    routes = {c['route_id'] for c in current if c['route_id'] is not None}
+    return current, locations, routes
+
+
+def generation():
+    return _generation
@@ -0,0 +1,109 @@
+import json
+import numpy as np
+from pages import catalogue, fileio, repository, storage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # analytics falls back to projecting the operational records
+    pa = pq = None
+
+# Column-oriented copies of the operational tables for the analytics page.
+# Each snapshot is a Parquet file tagged with the storage stamp it was
+# written at; a reader asks only for the columns its chart needs, and a
+# snapshot whose stamp no longer matches is rebuilt from the store.
+PATHS = {
+    'routes': "data/routes.parquet",
+    'locations': "data/locations.parquet"
+}
+STAMP_KEY = b"campus.stamp"
+
+
+def _stamp_text(stamp):
+    return json.dumps(stamp).encode('utf-8')
+
+
+def _project(table, records, columns):
+    result = {}
+    for name, kind in storage.TABLES[table]['columns']:
+        if name in columns:
+            values = [r[name] for r in records]
+            result[name] = np.array(values, dtype=object if kind is str else storage.NUMPY_TYPES[kind])
+    return result
+
+
+def write(table, stamp, records):
+    names = storage.fields(table)
+    columns = _project(table, records, names)
+    data = pa.table({name: columns[name] for name in names})
+    data = data.replace_schema_metadata({STAMP_KEY: _stamp_text(stamp)})
+    with fileio.atomic_write(PATHS[table], "wb") as f:
+        pq.write_table(data, f)
+
+
+def _read_table(table, stamp, columns, encoded=()):
+    try:
+        snapshot = pq.ParquetFile(PATHS[table], read_dictionary=list(encoded))
+        if (snapshot.schema_arrow.metadata or {}).get(STAMP_KEY) != _stamp_text(stamp):
+            return None
+        return snapshot.read(columns=columns)
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def _read_snapshot(table, stamp, columns):
+    data = _read_table(table, stamp, columns)
+    if data is None:
+        return None
+    return {name: data.column(name).to_numpy() for name in columns}
+
+
+def read(table, columns=None):
+    # {column: numpy array} for the requested columns (all when None);
+    # string columns come back as object arrays
+    columns = list(columns or storage.fields(table))
+    if pq is None:
+        return _project(table, storage.get_storage().records(table), columns)
+    stamp = repository.stamp(table)
+    result = _read_snapshot(table, stamp, columns)
+    if result is None:
+        records = storage.get_storage().records(table)
+        try:
+            write(table, stamp, records)
+        except OSError:
+            pass
+        result = _project(table, records, columns)
+    return result
+
+
+def read_current(table, stamp, columns, id_columns=()):
+    # read() and read_ids() in one, from the Parquet snapshot taken at
+    # stamp; None when there is none (or no pyarrow) rather than building
+    # one from the storage cache
+    if pq is None:
+        return None
+    data = _read_table(table, stamp, list(columns) + list(id_columns), list(id_columns))
+    if data is None:
+        return None
+    result = {name: data.column(name).to_numpy() for name in columns}
+    for name in id_columns:
+        result[name] = _ids(data, name)
+    return result
+
+
+def read_ids(table, columns):
+    # {column: int64 array of catalogue ids} for columns holding location
+    # names. Parquet keeps them dictionary-encoded, so only the distinct
+    # names go through the catalogue and every row is one array lookup.
+    columns = list(columns)
+    data = _read_table(table, repository.stamp(table), columns, columns) if pq is not None else None
+    if data is None:
+        return {name: catalogue.ids(values) for name, values in read(table, columns).items()}
+    return {name: _ids(data, name) for name in columns}
+
+
+def _ids(data, name):
+    encoded = data.column(name).combine_chunks()
+    lookup = catalogue.ids(encoded.dictionary.to_pylist())
+    return lookup[encoded.indices.to_numpy(zero_copy_only=False)]
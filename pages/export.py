@@ -0,0 +1,92 @@
+import io
+import csv
+import json
+from pages import repository, storage
+
+# Streaming exports for the /api/export endpoints. Records are pulled from
+# repository.scan one at a time and written out in CHUNK_BYTES pieces, so
+# an export starts sending at once and never sits in memory whole.
+CHUNK_BYTES = 64 * 1024
+FORMATS = {
+    'csv': "text/csv",
+    'json': "application/json"
+}
+# the filters each table accepts, matching what its pages filter on
+FILTERS = {
+    'routes': ('accessible',),
+    'locations': ('accessible', 'building'),
+    'notifications': ('user_id',)
+}
+TRUE_WORDS = ("true", "1", "yes")
+FALSE_WORDS = ("false", "0", "no")
+
+
+def parse_filters(table, args):
+    # {column: typed value} from query arguments; raises ValueError
+    kinds = dict(storage.TABLES[table]['columns'])
+    filters = {}
+    for name in FILTERS[table]:
+        text = (args.get(name) or "").strip()
+        if not text:
+            continue
+        kind = kinds[name]
+        if kind is bool:
+            if text.lower() not in TRUE_WORDS + FALSE_WORDS:
+                raise ValueError("'%s' must be true or false" % name)
+            filters[name] = text.lower() in TRUE_WORDS
+        elif kind is int:
+            try:
+                filters[name] = int(text)
+            except ValueError:
+                raise ValueError("'%s' must be a whole number" % name)
+        else:
+            filters[name] = text
+    return filters
+
+
+def records(table, filters, search=None):
+    # search works like the search boxes: a case-insensitive substring of any field
+    text = (search or "").strip().lower()
+    for record in repository.scan(table, filters):
+        if not text or any(text in str(value).lower() for value in record.values()):
+            yield record
+
+
+def _chunked(pieces):
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _csv_lines(table, rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=storage.fields(table), extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    yield out.getvalue()
+
+
+def _json_items(rows):
+    yield "["
+    separator = "\n"
+    for row in rows:
+        yield separator + json.dumps(row.to_dict())
+        separator = ",\n"
+    yield "\n]\n"
+
+
+def stream(table, fmt, rows):
+    pieces = _csv_lines(table, rows) if fmt == 'csv' else _json_items(rows)
+    return _chunked(pieces)
@@ -0,0 +1,45 @@
+from dash import html, dcc
+import dash_bootstrap_components as dbc
+
+# Bulk-import card shared by the admin Routes and Locations pages; each
+# page wires its own callback to the "<prefix>-upload" component.
+
+
+def upload_card(prefix, columns):
+    return dbc.Card([
+        dbc.CardBody([
+            html.H3("Bulk Import", className="mb-3"),
+            html.P("CSV with columns: " + ", ".join(columns), className="text-muted"),
+            dcc.Upload(
+                id=f"{prefix}-upload",
+                children=html.Div(["Drag and drop or ", html.A("select a CSV file")]),
+                accept=".csv,text/csv",
+                multiple=False,
+                style={
+                    "borderWidth": "1px",
+                    "borderStyle": "dashed",
+                    "borderRadius": "5px",
+                    "textAlign": "center",
+                    "padding": "20px"
+                }
+            ),
+            dcc.Loading(html.Div(id=f"{prefix}-import-result", className="mt-3"))
+        ])
+    ], className="mb-4 shadow-sm")
+
+
+def summary_view(filename, summary):
+    color = "success" if not summary['rejected'] and summary['imported'] else "warning"
+    if not summary['rows']:
+        color = "danger"
+    text = "%s: %d rows read, %d imported, %d rejected in %.1f s" % (
+        filename, summary['rows'], summary['imported'], summary['rejected'], summary['seconds']
+    )
+    children = [dbc.Alert(text, color=color, className="mb-2")]
+    if summary['errors']:
+        header = html.Tr([html.Th("Line", className="p-2 bg-light border"), html.Th("Problem", className="p-2 bg-light border")])
+        rows = [html.Tr([html.Td(line, className="p-2 border"), html.Td(message, className="p-2 border")]) for line, message in summary['errors']]
+        children.append(dbc.Table([header] + rows, bordered=False, hover=True, responsive=True, striped=True, size="sm", className="mb-0"))
+        if summary['rejected'] > len(summary['errors']):
+            children.append(html.Div("Showing the first %d problems." % len(summary['errors']), className="text-muted mt-1"))
+    return children
@@ -1,8 +1,10 @@
 import dash
 from dash import html, dcc, Input, Output, State
-import csv, os, hashlib
+import hashlib
 import json
 
+from pages import repository
+
 dash.register_page(__name__, path="/")
 
 def hash_password(pw):
@@ -137,20 +139,17 @@ def login_user(n, username, password):
     if not username or not password:
         return "Please enter both username and password.", dash.no_update, dash.no_update
 
-    filepath = "data/user_data.csv"
-
-    if not os.path.exists(filepath):
+    users = repository.read_users()
+    if not users:
         return "User database not found.", dash.no_update, dash.no_update
 
     hashed_pw = hash_password(password)
 
-    with open(filepath, "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row["username"] == username and row["password"] == hashed_pw:
-                # store username and role in dcc.Store
-                user_data = {"username": row["username"], "role": row["role"]}
-                return html.Div("Login Successful!", style={"color": "green"}), "/dashboard", json.dumps(user_data)
+    for row in users:
+        if row["username"] == username and row["password"] == hashed_pw:
+            # store username and role in dcc.Store
+            user_data = {"username": row["username"], "role": row["role"]}
+            return html.Div("Login Successful!", style={"color": "green"}), "/dashboard", json.dumps(user_data)
 
     return "Invalid username or password.", dash.no_update, dash.no_update
 
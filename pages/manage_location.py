@@ -1,68 +1,12 @@
-import os
-import csv
 import dash
 from dash import html, dcc, Input, Output, State, callback
 from dash.dependencies import ALL
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+from pages import bulk_import, catalogue, import_panel, notification_queue, repository
 
-LOC_CSV_PATH = "data/locations.csv"
-NOTIF_CSV_PATH = "data/notification.csv"
 BLUE = "#2f80ed"
 
-def read_locations():
-    locations = []
-    if os.path.exists(LOC_CSV_PATH):
-        with open(LOC_CSV_PATH, 'r', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                locations.append({
-                    'id': int(row['id']),
-                    'name': row['name'],
-                    'building': row['building'],
-                    'floor': int(row['floor']),
-                    'accessible': row['accessible'].lower() == 'true'
-                })
-    return locations
-
-def save_locations(locations):
-    with open(LOC_CSV_PATH, 'w', newline='') as f:
-        if locations:
-            writer = csv.DictWriter(f, fieldnames=locations[0].keys())
-            writer.writeheader()
-            for loc in locations:
-                loc_copy = loc.copy()
-                loc_copy['accessible'] = str(loc_copy['accessible'])
-                writer.writerow(loc_copy)
-
-def add_notification(message, user_id=1):
-    notifications = []
-    if os.path.exists(NOTIF_CSV_PATH):
-        with open(NOTIF_CSV_PATH, 'r', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                notifications.append({
-                    'id': int(row['id']),
-                    'user_id': int(row['user_id']),
-                    'message': row['message'],
-                    'delivered': row['delivered'].lower() == 'true'
-                })
-    new_id = max([n['id'] for n in notifications], default=0) + 1
-    notifications.append({
-        'id': new_id,
-        'user_id': user_id,
-        'message': message,
-        'delivered': False
-    })
-    with open(NOTIF_CSV_PATH, 'w', newline='') as f:
-        if notifications:
-            writer = csv.DictWriter(f, fieldnames=notifications[0].keys())
-            writer.writeheader()
-            for n in notifications:
-                n_copy = n.copy()
-                n_copy['delivered'] = str(n_copy['delivered'])
-                writer.writerow(n_copy)
-
 def generate_locations_table(locations):
     header = html.Tr([
         html.Th("ID", className="p-2 bg-light border"),
@@ -125,7 +69,7 @@ def generate_locations_table(locations):
     )
 
 def locations_layout():
-    locations = read_locations()
+    locations = repository.read_locations()
 
     return dbc.Container([
 
@@ -172,6 +116,8 @@ def locations_layout():
             ])
         ], className="mb-4 shadow-sm"),
 
+        import_panel.upload_card("loc", ["name", "building", "floor", "accessible"]),
+
         dbc.Card(
             className="p-3 mb-4 shadow-sm",
             children=[
@@ -205,15 +151,15 @@ def delete_location(clicks):
 
     loc_id = dash.callback_context.triggered_id["index"]
 
-    locations = read_locations()
-    loc_name = next(loc['name'] for loc in locations if loc['id'] == loc_id)
-
-    locations = [loc for loc in locations if loc['id'] != loc_id]
-    save_locations(locations)
+    locations = repository.read_locations()
+    location = next((loc for loc in locations if loc['id'] == loc_id), None)
+    if location is None or not repository.delete_location(loc_id):
+        return generate_locations_table(repository.read_locations()), "Location not found", True
 
-    add_notification(f"Location '{loc_name}' deleted")
+    catalogue.record_changed('locations', location, None)
+    notification_queue.enqueue(f"Location '{location['name']}' deleted")
 
-    return generate_locations_table(locations), "Location deleted successfully", True
+    return generate_locations_table(repository.read_locations()), "Location deleted successfully", True
 
 @callback(
     Output("loc-name", "value", allow_duplicate=True),
@@ -230,7 +176,7 @@ def edit_location(clicks):
         raise PreventUpdate
 
     loc_id = dash.callback_context.triggered_id["index"]
-    locations = read_locations()
+    locations = repository.read_locations()
     r = next(loc for loc in locations if loc['id'] == loc_id)
 
     return r["name"], r["building"], r["floor"], r["accessible"], "Update", loc_id
@@ -264,30 +210,43 @@ def save_location(_, name, building, floor, accessible, edit_id):
     if not all([name, building, floor]) or accessible is None:
         raise PreventUpdate
 
-    locations = read_locations()
-
     if edit_id is not None:
-        for loc in locations:
-            if loc['id'] == edit_id:
-                loc.update({'name': name, 'building': building, 'floor': int(floor), 'accessible': accessible})
-                break
+        old = next((loc for loc in repository.read_locations() if loc['id'] == edit_id), None)
+        location = {'id': edit_id, 'name': name, 'building': building, 'floor': int(floor), 'accessible': accessible}
+        if not repository.update_location(location):
+            return generate_locations_table(repository.read_locations()), "Location not found, it may have been deleted", True
+        catalogue.record_changed('locations', old, location)
         msg = "Location updated successfully"
-        add_notification(f"Location '{name}' updated")
+        notification_queue.enqueue(f"Location '{name}' updated")
     else:
-        new_id = max([loc['id'] for loc in locations], default=0) + 1
-        locations.append({
-            'id': new_id,
+        location = repository.add_location({
+            'id': None,
             'name': name,
             'building': building,
             'floor': int(floor),
             'accessible': accessible
         })
+        catalogue.record_changed('locations', None, location)
         msg = "Location added successfully"
-        add_notification(f"New location '{building}, {floor}' added")
+        notification_queue.enqueue(f"New location '{building}, {floor}' added")
 
-    save_locations(locations)
+    return generate_locations_table(repository.read_locations()), msg, True
+
+@callback(
+    Output("manage-table-loc", "children", allow_duplicate=True),
+    Output("loc-import-result", "children"),
+    Input("loc-upload", "contents"),
+    State("loc-upload", "filename"),
+    prevent_initial_call=True
+)
+def import_locations(contents, filename):
+    if contents is None:
+        raise PreventUpdate
 
-    return generate_locations_table(locations), msg, True
+    summary = bulk_import.import_upload('locations', contents)
+    if summary['imported']:
+        catalogue.invalidate('locations')
+    return generate_locations_table(repository.read_locations()), import_panel.summary_view(filename, summary)
 
 @callback(
     Output("manage-table-loc", "children", allow_duplicate=True),
@@ -295,10 +254,7 @@ def save_location(_, name, building, floor, accessible, edit_id):
     prevent_initial_call=True
 )
 def search_locations(text):
-    locations = read_locations()
     if not text:
-        return generate_locations_table(locations)
+        return generate_locations_table(repository.read_locations())
 
-    t = text.lower()
-    filtered = [loc for loc in locations if t in str(loc).lower()]
-    return generate_locations_table(filtered)
+    return generate_locations_table(repository.search('locations', text))
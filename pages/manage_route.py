@@ -1,65 +1,13 @@
-import os
-import csv
 import dash
 from dash import html, dcc, Input, Output, State, callback
 from dash.dependencies import ALL
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+from pages import bulk_import, catalogue, import_panel, notification_queue, repository, routing
 
-CSV_PATH = "data/routes.csv"
-NOTIF_CSV_PATH = "data/notification.csv"
 BLUE = "#2f80ed"
 
 
-def read_routes():
-    routes = []
-    if os.path.exists(CSV_PATH):
-        with open(CSV_PATH, "r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                row["id"] = int(row["id"])
-                row["distance_m"] = float(row["distance_m"])
-                row["accessible"] = row["accessible"].lower() == "true"
-                routes.append(row)
-    return routes
-
-def save_routes(routes):
-    with open(CSV_PATH, "w", newline="") as file:
-        if routes:
-            writer = csv.DictWriter(file, fieldnames=routes[0].keys())
-            writer.writeheader()
-            for r in routes:
-                writer.writerow(r)
-
-
-def add_notification(message, user_id=1):
-    notifications = []
-    if os.path.exists(NOTIF_CSV_PATH):
-        with open(NOTIF_CSV_PATH, "r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                row["id"] = int(row["id"])
-                row["user_id"] = int(row["user_id"])
-                row["delivered"] = row["delivered"].lower() == "true"
-                notifications.append(row)
-
-    new_id = max((n["id"] for n in notifications), default=0) + 1
-
-    notifications.append({
-        "id": new_id,
-        "user_id": user_id,
-        "message": message,
-        "delivered": False
-    })
-
-    with open(NOTIF_CSV_PATH, "w", newline="") as file:
-        if notifications:
-            writer = csv.DictWriter(file, fieldnames=notifications[0].keys())
-            writer.writeheader()
-            for n in notifications:
-                writer.writerow(n)
-
-
 def generate_table(routes):
     if not routes:
         return html.Div("No routes found.")
@@ -99,7 +47,7 @@ def generate_table(routes):
 
 
 def layout():
-    routes = read_routes()
+    routes = repository.read_routes()
 
     return dbc.Container([
 
@@ -149,6 +97,8 @@ def layout():
             ])
         ], className="mb-4 shadow-sm"),
 
+        import_panel.upload_card("route", ["start_location", "end_location", "distance_m", "accessible"]),
+
         dbc.Card(
             className="p-3 mb-4 shadow-sm",
             children=[
@@ -181,15 +131,16 @@ def delete_route(clicks):
 
     route_id = dash.callback_context.triggered_id["index"]
 
-    routes = read_routes()
+    routes = repository.read_routes()
     r = next((route for route in routes if route["id"] == route_id), None)
+    if r is None or not repository.delete_route(route_id):
+        return generate_table(repository.read_routes()), "Route not found", True
 
-    routes = [route for route in routes if route["id"] != route_id]
-    save_routes(routes)
+    catalogue.record_changed('routes', r, None)
+    routing.route_deleted(route_id)
+    notification_queue.enqueue(f"Route '{r['start_location']} → {r['end_location']}' deleted")
 
-    add_notification(f"Route '{r['start_location']} → {r['end_location']}' deleted")
-
-    return generate_table(routes), "Route deleted successfully", True
+    return generate_table(repository.read_routes()), "Route deleted successfully", True
 
 
 @callback(
@@ -207,7 +158,7 @@ def edit_route(clicks):
         raise PreventUpdate
 
     route_id = dash.callback_context.triggered_id["index"]
-    routes = read_routes()
+    routes = repository.read_routes()
     r = next((route for route in routes if route["id"] == route_id), None)
 
     return r["start_location"], r["end_location"], r["distance_m"], r["accessible"], "Update", route_id
@@ -245,32 +196,53 @@ def save_route(_, s, e, d, a, edit_id):
     if not all([s, e]) or d is None or a is None:
         return dash.no_update, "Please fill all fields", dash.no_update, False
 
-    routes = read_routes()
-
+    old = None
     if edit_id is not None:
-        for r in routes:
-            if r["id"] == edit_id:
-                r["start_location"] = s
-                r["end_location"] = e
-                r["distance_m"] = d
-                r["accessible"] = a
-                break
+        old = next((route for route in repository.read_routes() if route["id"] == edit_id), None)
+        route = {
+            "id": edit_id,
+            "start_location": s,
+            "end_location": e,
+            "distance_m": d,
+            "accessible": a
+        }
+        if not repository.update_route(route):
+            msg = "Route not found, it may have been deleted"
+            return generate_table(repository.read_routes()), msg, msg, True
         msg = "Route updated"
-        add_notification(f"Route '{s} → {e}' updated")
+        notification_queue.enqueue(f"Route '{s} → {e}' updated")
     else:
-        new_id = max((r["id"] for r in routes), default=0) + 1
-        routes.append({
-            "id": new_id,
+        route = repository.add_route({
+            "id": None,
             "start_location": s,
             "end_location": e,
             "distance_m": d,
             "accessible": a
         })
         msg = "Route added"
-        add_notification(f"New route '{s} → {e}' added")
+        notification_queue.enqueue(f"New route '{s} → {e}' added")
+
+    catalogue.record_changed('routes', old, route)
+    routing.route_saved(route)
+    return generate_table(repository.read_routes()), msg, msg, True
+
+
+@callback(
+    Output("table", "children", allow_duplicate=True),
+    Output("route-import-result", "children"),
+    Input("route-upload", "contents"),
+    State("route-upload", "filename"),
+    prevent_initial_call=True
+)
+def import_routes(contents, filename):
+    if contents is None:
+        raise PreventUpdate
 
-    save_routes(routes)
-    return generate_table(routes), msg, msg, True
+    summary = bulk_import.import_upload('routes', contents)
+    if summary['imported']:
+        catalogue.invalidate('routes')
+        routing.routes_imported()
+    return generate_table(repository.read_routes()), import_panel.summary_view(filename, summary)
 
 
 @callback(
@@ -279,10 +251,7 @@ def save_route(_, s, e, d, a, edit_id):
     prevent_initial_call=True
 )
 def search_routes(text):
-    routes = read_routes()
     if not text:
-        return generate_table(routes)
+        return generate_table(repository.read_routes())
 
-    t = text.lower()
-    filtered = [r for r in routes if t in str(r).lower()]
-    return generate_table(filtered)
+    return generate_table(repository.search('routes', text))
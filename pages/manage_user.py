@@ -1,58 +1,20 @@
-import os
-import csv
 import hashlib
 import dash
 from dash import html, dcc, Input, Output, State, callback
 from dash.dependencies import ALL
 import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
+from pages import repository
 
 BLUE = "#0B63C5"
 WHITE = "#FFFFFF"
 LIGHT = "#F4F9FF"
-CSV_PATH = "data/user_data.csv"
 
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-def read_users():
-    users = []
-
-    if not os.path.exists(CSV_PATH):
-        return users
-
-    with open(CSV_PATH, "r", newline="", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            users.append({
-                "username": row.get("username", ""),
-                "email": row.get("email", ""),
-                "role": row.get("role", ""),
-                "password": row.get("password", "")
-            })
-    return users
-
-
-def save_users(users):
-    with open(CSV_PATH, "w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(
-            file,
-            fieldnames=["username", "email", "role", "password"]
-        )
-        writer.writeheader()
-        for u in users:
-            row = {
-                "username": u.get("username", ""),
-                "email": u.get("email", ""),
-                "role": u.get("role", ""),
-                "password": u.get("password", "")
-            }
-            writer.writerow(row)
-
-
-
 def generate_user_table(users):
     header = html.Tr(
         [html.Th(col, className="p-2 border-bottom") for col in ["username", "email", "role"]] +
@@ -99,7 +61,7 @@ def generate_user_table(users):
 
 
 def layout():
-    users = read_users()
+    users = repository.read_users()
 
     return dbc.Container(
         fluid=True,
@@ -167,11 +129,9 @@ def delete_user(clicks):
         raise PreventUpdate
 
     index = dash.callback_context.triggered_id["index"]
-    users = read_users()
-    users.pop(index)
-    save_users(users)
+    repository.delete_user(repository.read_users()[index]["username"])
 
-    return generate_user_table(users)
+    return generate_user_table(repository.read_users())
 
 @callback(
     Output("input-username", "value", allow_duplicate=True),
@@ -188,7 +148,7 @@ def load_user(clicks):
         raise PreventUpdate
 
     index = dash.callback_context.triggered_id["index"]
-    user = read_users()[index]
+    user = repository.read_users()[index]
 
     return user["username"], user["email"], user["role"], "", "Update", index
 
@@ -223,17 +183,19 @@ def save_user(_, username, email, role, password, edit_index):
     if not all([username, email, role, password]):
         return dash.no_update, "Please fill all required fields."
 
-    users = read_users()
-
     if edit_index is not None:
-        users[edit_index]["username"] = username
-        users[edit_index]["email"] = email
-        users[edit_index]["role"] = role
-        if password:
-            users[edit_index]["password"] = hash_password(password)
+        user = repository.read_users()[edit_index]
+        old_username = user["username"]
+        user = user.replace(
+            username=username,
+            email=email,
+            role=role,
+            password=hash_password(password) if password else user["password"]
+        )
+        repository.update_user(old_username, user)
         msg = "User updated."
     else:
-        users.append({
+        repository.add_user({
             "username": username,
             "email": email,
             "role": role,
@@ -241,8 +203,7 @@ def save_user(_, username, email, role, password, edit_index):
         })
         msg = f"User '{username}' added."
 
-    save_users(users)
-    return generate_user_table(users), msg
+    return generate_user_table(repository.read_users()), msg
 
 
 
@@ -252,15 +213,7 @@ def save_user(_, username, email, role, password, edit_index):
     prevent_initial_call=True
 )
 def search_users(text):
-    users = read_users()
-
     if not text:
-        return generate_user_table(users)
-
-    t = text.lower()
-    filtered = [
-        u for u in users
-        if t in str(u).lower()
-    ]
+        return generate_user_table(repository.read_users())
 
-    return generate_user_table(filtered)
+    return generate_user_table(repository.search('users', text))
@@ -0,0 +1,149 @@
+import queue
+import atexit
+import logging
+import threading
+import time
+from pages import repository
+
+# Notifications raised as a side effect of an admin action are not needed
+# by the request that raised them, so they are handed to a background
+# writer instead of being written inside the callback. The writer drains
+# the queue in batches of up to BATCH_SIZE, or whatever arrived within
+# FLUSH_INTERVAL, and writes each batch with a single insert.
+FLUSH_INTERVAL = 0.25
+BATCH_SIZE = 200
+MAX_PENDING = 10000
+PUT_TIMEOUT = 1.0
+SHUTDOWN_TIMEOUT = 10.0
+# delay before retrying a failed write, doubling up to RETRY_MAX
+RETRY_INITIAL = 0.5
+RETRY_MAX = 30.0
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+_queue = queue.Queue(MAX_PENDING)
+_thread = None
+_start_lock = threading.Lock()
+# batches taken off the queue but not yet written, oldest first; only the
+# writer thread changes it
+_backlog = []
+_retry_at = None
+_retry_delay = RETRY_INITIAL
+_drained = threading.Condition()
+
+
+def _ensure_started():
+    global _thread
+    with _start_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="notification-writer", daemon=True)
+            _thread.start()
+
+
+def enqueue(message, user_id=1, delivered=False):
+    record = {
+        "id": None,
+        "user_id": user_id,
+        "message": message,
+        "delivered": delivered
+    }
+    _ensure_started()
+    try:
+        # backpressure: a full queue holds the caller back for a moment
+        _queue.put(record, timeout=PUT_TIMEOUT)
+    except queue.Full:
+        # the writer is too far behind; write through rather than drop it
+        repository.add_notifications([record])
+
+
+def _collect():
+    # the next batch off the queue, waiting at most until a retry is due;
+    # (batch, stopping)
+    timeout = None if _retry_at is None else max(0, _retry_at - time.monotonic())
+    try:
+        item = _queue.get(timeout=timeout)
+    except queue.Empty:
+        return [], False
+    batch = []
+    stopping = False
+    deadline = time.monotonic() + FLUSH_INTERVAL
+    while True:
+        if item is _STOP:
+            stopping = True
+        else:
+            batch.append(item)
+        if stopping or len(batch) >= BATCH_SIZE:
+            break
+        try:
+            item = _queue.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            break
+    return batch, stopping
+
+
+def _run():
+    stopping = False
+    while not stopping:
+        batch, stopping = _collect()
+        if batch:
+            _backlog.append(batch)
+        for _ in range(len(batch) + stopping):
+            _queue.task_done()
+        if _retry_at is None or stopping or time.monotonic() >= _retry_at:
+            _write()
+    if _backlog:
+        log.error("notification writer stopped with %d notifications unwritten", sum(map(len, _backlog)))
+
+
+def _write():
+    # Writes the backlog oldest first. A batch that fails stays at the head
+    # and the writer tries again after a delay that doubles up to
+    # RETRY_MAX, so notifications wait out a storage outage instead of
+    # being lost.
+    global _retry_at, _retry_delay
+    while _backlog:
+        try:
+            repository.add_notifications(_backlog[0])
+        except Exception as e:
+            log.warning("notification writer: %d notifications unwritten, retrying in %.1f s: %r",
+                        sum(map(len, _backlog)), _retry_delay, e)
+            _retry_at = time.monotonic() + _retry_delay
+            _retry_delay = min(_retry_delay * 2, RETRY_MAX)
+            return
+        _backlog.pop(0)
+    _retry_at = None
+    _retry_delay = RETRY_INITIAL
+    with _drained:
+        _drained.notify_all()
+
+
+def pending():
+    return _queue.qsize() + sum(map(len, _backlog))
+
+
+def flush(timeout=None):
+    # Waits until everything queued so far has been written, or until
+    # timeout runs out (a storage outage, a stuck write). Returns how many
+    # notifications are still unwritten then: 0 once all are in.
+    if _thread is None or not _thread.is_alive():
+        return pending()
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining():
+        return None if deadline is None else max(0, deadline - time.monotonic())
+
+    with _queue.all_tasks_done:
+        while _queue.unfinished_tasks and remaining() != 0:
+            _queue.all_tasks_done.wait(remaining())
+    with _drained:
+        _drained.wait_for(lambda: not _backlog, remaining())
+    return pending()
+
+
+@atexit.register
+def shutdown():
+    if _thread is None or not _thread.is_alive():
+        return
+    _queue.put(_STOP)
+    _thread.join(SHUTDOWN_TIMEOUT)
@@ -1,43 +1,13 @@
-import os
-import csv
 import dash
 from dash import html, dcc, Input, Output, State, callback
 from dash.dependencies import ALL
 from flask import session
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+from pages import repository
 
-NOTIF_CSV_PATH = "data/notification.csv"
 BLUE = "#2f80ed"
 
-def read_notifications():
-    if os.path.exists(NOTIF_CSV_PATH):
-        with open(NOTIF_CSV_PATH, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            notifications = []
-            for row in reader:
-                notifications.append({
-                    "id": int(row["id"]),
-                    "user_id": int(row["user_id"]),
-                    "message": row["message"],
-                    "delivered": row["delivered"].lower() == "true"
-                })
-            return notifications
-    return []
-
-def save_notifications(notifications):
-    with open(NOTIF_CSV_PATH, "w", encoding="utf-8", newline="") as f:
-        fieldnames = ["id", "user_id", "message", "delivered"]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for n in notifications:
-            writer.writerow({
-                "id": n["id"],
-                "user_id": n["user_id"],
-                "message": n["message"],
-                "delivered": n["delivered"]
-            })
-
 def generate_notifications_table(notifications, is_admin=False):
     header_cells = [
         html.Th("ID", className="p-2 bg-light border"),
@@ -88,7 +58,7 @@ def generate_notifications_table(notifications, is_admin=False):
     return dbc.Table([header] + rows, bordered=False, hover=True, responsive=True, striped=True, className="mb-0")
 
 def notifications_layout():
-    notifications = read_notifications()
+    notifications = repository.read_notifications()
     return dbc.Container([
         dbc.Card([
             dbc.CardBody([
@@ -141,10 +111,8 @@ def delete_notification(clicks):
 
     ctx = dash.callback_context
     notif_id = ctx.triggered_id["index"]
-    notifications = read_notifications()
-    notifications = [n for n in notifications if n["id"] != notif_id]
-    save_notifications(notifications)
-    return generate_notifications_table(notifications, is_admin=True)
+    repository.delete_notification(notif_id)
+    return generate_notifications_table(repository.read_notifications(), is_admin=True)
 
 @callback(
     Output("notif-user-id", "value"),
@@ -167,7 +135,7 @@ def edit_reset_notification(edit_clicks, reset_click):
         if not any(edit_clicks):
             raise PreventUpdate
         notif_id = ctx.triggered_id["index"]
-        notifications = read_notifications()
+        notifications = repository.read_notifications()
         row = next((n for n in notifications if n["id"] == notif_id), None)
         if row is None:
             raise PreventUpdate
@@ -190,22 +158,14 @@ def save_notification(_, user_id, message, delivered, edit_id):
     if not all([user_id, message]) or delivered is None:
         return dash.no_update, "Please fill all fields"
 
-    notifications = read_notifications()
-
     if edit_id is not None:
-        for n in notifications:
-            if n["id"] == edit_id:
-                n["user_id"] = user_id
-                n["message"] = message
-                n["delivered"] = delivered
+        repository.update_notification({"id": edit_id, "user_id": user_id, "message": message, "delivered": delivered})
         msg = "Notification updated successfully"
     else:
-        new_id = max([n["id"] for n in notifications], default=0) + 1
-        notifications.append({"id": new_id, "user_id": user_id, "message": message, "delivered": delivered})
+        repository.add_notification(message, user_id=user_id, delivered=delivered)
         msg = "Notification added successfully"
 
-    save_notifications(notifications)
-    return generate_notifications_table(notifications, is_admin=True), msg
+    return generate_notifications_table(repository.read_notifications(), is_admin=True), msg
 
 @callback(
     Output("manage-table-notif", "children", allow_duplicate=True),
@@ -213,12 +173,6 @@ def save_notification(_, user_id, message, delivered, edit_id):
     prevent_initial_call=True
 )
 def search_notifications(text):
-    notifications = read_notifications()
     if not text:
-        return generate_notifications_table(notifications, is_admin=True)
-    t = text.lower()
-    filtered = []
-    for n in notifications:
-        if any(t in str(v).lower() for v in n.values()):
-            filtered.append(n)
-    return generate_notifications_table(filtered, is_admin=True)
+        return generate_notifications_table(repository.read_notifications(), is_admin=True)
+    return generate_notifications_table(repository.search('notifications', text), is_admin=True)
@@ -0,0 +1,170 @@
+import gc
+from contextlib import contextmanager
+
+# One record class per table. A record keeps its fields in __slots__
+# rather than a per-instance dict, which is most of what a cached table
+# costs at scale (python -m benchmarks.bench_record_memory). Records still
+# read like the dicts the pages were written against: r['name'],
+# r.get('name'), dict(r), keys()/values()/items(), and str(r) prints what
+# the dict would, so the search boxes match exactly the same rows.
+#
+# The storage cache hands the same objects to every reader, so a record is
+# never changed in place: replace() returns an edited copy.
+
+
+def _flag(value):
+    return value if value is True or value is False else str(value).lower() in ('true', '1')
+
+
+@contextmanager
+def bulk():
+    # Unlike a dict of plain values, a record is tracked by the cycle
+    # collector, so building a whole table would run full collections over
+    # the growing list again and again. Records never reference containers,
+    # so collection is simply paused while a table is built.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class Record:
+    __slots__ = ()
+    COLUMNS = ()
+
+    def __getitem__(self, name):
+        if name not in self.FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def get(self, name, default=None):
+        return getattr(self, name) if name in self.FIELDS else default
+
+    def __contains__(self, name):
+        return name in self.FIELDS
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def keys(self):
+        return self.FIELDS
+
+    def values(self):
+        return [getattr(self, name) for name in self.FIELDS]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.FIELDS]
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def replace(self, **changes):
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise KeyError(", ".join(sorted(unknown)))
+        return type(self)(*[changes.get(name, getattr(self, name)) for name in self.FIELDS])
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(other) is type(self) and other.values() == self.values()
+        if isinstance(other, dict):
+            return other == self.to_dict()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __reduce__(self):
+        return type(self), tuple(self.values())
+
+
+class Route(Record):
+    __slots__ = FIELDS = ('id', 'start_location', 'end_location', 'distance_m', 'accessible')
+    COLUMNS = (('id', int), ('start_location', str), ('end_location', str), ('distance_m', float), ('accessible', bool))
+
+    def __init__(self, id, start_location, end_location, distance_m, accessible):
+        self.id = id
+        self.start_location = start_location
+        self.end_location = end_location
+        self.distance_m = distance_m
+        self.accessible = accessible
+
+    @classmethod
+    def from_row(cls, row):
+        # row is any mapping: a csv.DictReader row of strings, a JSON log
+        # entry, a SQLite row or a form submission
+        get = row.get
+        return cls(int(get('id')), get('start_location') or "", get('end_location') or "",
+                   float(get('distance_m')), _flag(get('accessible')))
+
+
+class Location(Record):
+    __slots__ = FIELDS = ('id', 'name', 'building', 'floor', 'accessible')
+    COLUMNS = (('id', int), ('name', str), ('building', str), ('floor', int), ('accessible', bool))
+
+    def __init__(self, id, name, building, floor, accessible):
+        self.id = id
+        self.name = name
+        self.building = building
+        self.floor = floor
+        self.accessible = accessible
+
+    @classmethod
+    def from_row(cls, row):
+        get = row.get
+        return cls(int(get('id')), get('name') or "", get('building') or "", int(get('floor')), _flag(get('accessible')))
+
+
+class User(Record):
+    __slots__ = FIELDS = ('username', 'email', 'role', 'password')
+    COLUMNS = (('username', str), ('email', str), ('role', str), ('password', str))
+
+    def __init__(self, username, email, role, password):
+        self.username = username
+        self.email = email
+        self.role = role
+        self.password = password
+
+    @classmethod
+    def from_row(cls, row):
+        get = row.get
+        return cls(get('username') or "", get('email') or "", get('role') or "", get('password') or "")
+
+
+class Notification(Record):
+    __slots__ = FIELDS = ('id', 'user_id', 'message', 'delivered')
+    COLUMNS = (('id', int), ('user_id', int), ('message', str), ('delivered', bool))
+
+    def __init__(self, id, user_id, message, delivered):
+        self.id = id
+        self.user_id = user_id
+        self.message = message
+        self.delivered = delivered
+
+    @classmethod
+    def from_row(cls, row):
+        get = row.get
+        return cls(int(get('id')), int(get('user_id')), get('message') or "", _flag(get('delivered')))
+
+
+class Closure(Record):
+    __slots__ = FIELDS = ('notification_id', 'opened_at', 'expires_at')
+    COLUMNS = (('notification_id', int), ('opened_at', float), ('expires_at', float))
+
+    def __init__(self, notification_id, opened_at, expires_at):
+        self.notification_id = notification_id
+        self.opened_at = opened_at
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_row(cls, row):
+        get = row.get
+        return cls(int(get('notification_id')), float(get('opened_at')), float(get('expires_at')))
@@ -0,0 +1,152 @@
+from pages import search_index, storage
+from pages.storage import DuplicateKey
+
+# Every page reads and writes through here. The storage backend (CSV files
+# or SQLite, see pages/storage.py) caches parsed records and only reloads a
+# table when its stamp moves. The records (pages/records.py) are shared with
+# that cache: callers get a list of their own but never change a record in
+# place; record.replace(...) gives an edited copy to save.
+
+
+def stamp(table):
+    return storage.get_storage().stamp(table)
+
+
+def last_write(table):
+    # (stamp before, stamp after) of this thread's latest write to table.
+    # A cache patched with that write is current only if it was at the
+    # stamp before: otherwise someone else wrote in between.
+    return storage.last_written(table)
+
+
+def scan(table, filters=None):
+    # streamed straight from the backend rather than copied out of the cache
+    return storage.get_storage().scan(table, filters)
+
+
+def search(table, text):
+    # records with a field containing text, case-insensitively, from the
+    # table's search index (pages/search_index.py)
+    return search_index.search(table, text)
+
+
+def _read(table):
+    return list(storage.get_storage().records(table))
+
+
+def read_routes():
+    return _read('routes')
+
+
+def add_route(route):
+    return storage.get_storage().insert('routes', route)
+
+
+def add_routes(routes):
+    return storage.get_storage().insert_many('routes', routes)
+
+
+def tail_routes(cursor=None):
+    # (route changes logged since cursor, new cursor); changes is None when
+    # the caller has to fall back to read_routes()
+    return storage.get_storage().tail('routes', cursor)
+
+
+def update_route(route):
+    return storage.get_storage().update('routes', route['id'], route)
+
+
+def delete_route(route_id):
+    return storage.get_storage().delete('routes', route_id)
+
+
+def save_routes(routes):
+    storage.get_storage().replace('routes', routes)
+
+
+def read_locations():
+    return _read('locations')
+
+
+def add_location(location):
+    return storage.get_storage().insert('locations', location)
+
+
+def add_locations(locations):
+    return storage.get_storage().insert_many('locations', locations)
+
+
+def update_location(location):
+    return storage.get_storage().update('locations', location['id'], location)
+
+
+def delete_location(location_id):
+    return storage.get_storage().delete('locations', location_id)
+
+
+def save_locations(locations):
+    storage.get_storage().replace('locations', locations)
+
+
+def read_users():
+    return _read('users')
+
+
+def add_user(user):
+    return storage.get_storage().insert('users', user)
+
+
+def update_user(username, user):
+    return storage.get_storage().update('users', username, user)
+
+
+def delete_user(username):
+    return storage.get_storage().delete('users', username)
+
+
+def save_users(users):
+    storage.get_storage().replace('users', users)
+
+
+def read_notifications():
+    return _read('notifications')
+
+
+def add_notification(message, user_id=1, delivered=False):
+    notification = storage.get_storage().insert('notifications', {
+        "id": None,
+        "user_id": user_id,
+        "message": message,
+        "delivered": delivered
+    })
+    return notification["id"]
+
+
+def add_notifications(notifications):
+    return storage.get_storage().insert_many('notifications', notifications)
+
+
+def tail_notifications(cursor=None):
+    # (changes appended since cursor, new cursor); changes is None when the
+    # caller has to fall back to read_notifications()
+    return storage.get_storage().tail('notifications', cursor)
+
+
+def update_notification(notification):
+    return storage.get_storage().update('notifications', notification['id'], notification)
+
+
+def delete_notification(notification_id):
+    return storage.get_storage().delete('notifications', notification_id)
+
+
+def save_notifications(notifications):
+    storage.get_storage().replace('notifications', notifications)
+
+
+def read_closures():
+    return _read('closures')
+
+
+def add_closures(closures):
+    return storage.get_storage().insert_many('closures', closures)
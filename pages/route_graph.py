@@ -0,0 +1,856 @@
+import heapq
+import threading
+import time
+from array import array
+import numpy as np
+from pages import catalogue, columnar, repository, route_table, snapshot
+
+SNAPSHOT_PATH = "data/routes.snap"
+SNAPSHOT_DELAY = 2.0
+LANDMARKS = 8
+ALTERNATIVES = 5
+TIME_BUDGET = 0.25
+PATH_CACHE_SIZE = 1024
+COMPACT_MIN = 256
+COMPACT_FRACTION = 0.02
+# route edits from other workers replayed onto the loaded network, tables
+# included, before it is reloaded and the tables rebuilt instead
+CATCH_UP_MAX = 256
+INF = float('inf')
+SNAPSHOT_ARRAYS = ('offsets', 'edge_data', 'rev_offsets', 'rev_sources', 'rev_edges', 'id_order', 'sorted_ids')
+EDGE_DTYPE = np.dtype([('target', np.int32), ('weight', np.float64), ('accessible', bool), ('route_id', np.int32)])
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class _Arrays:
+    # One generation of a graph's CSR arrays plus the edits made since
+    # (added edges, removed route ids). compact() builds the next one and
+    # swaps it in with a single assignment, and readers take the current
+    # one once per call, so a search running meanwhile never pairs old
+    # offsets with new edge data or loses the pending edits.
+    __slots__ = SNAPSHOT_ARRAYS + ('nodes', 'added', 'added_in', 'added_routes', 'removed')
+
+    def __init__(self, arrays, nodes):
+        for key in SNAPSHOT_ARRAYS:
+            setattr(self, key, arrays[key])
+        self.nodes = nodes
+        self.added = {}
+        self.added_in = {}
+        self.added_routes = {}
+        self.removed = set()
+
+    def pending(self):
+        return bool(self.added_routes or self.removed)
+
+
+def _csr_property(key):
+    return property(lambda self: getattr(self._arrays, key))
+
+
+def _field_property(name):
+    return property(lambda self: self._arrays.edge_data[name])
+
+
+def _no_potential(v):
+    return 0.0
+
+
+class RouteGraph:
+    # Compressed sparse row storage: the out-edges of location u sit at
+    # offsets[u]:offsets[u + 1] of the targets/weights/accessible/route_ids
+    # arrays, and a reverse index gives the in-edges. Edits go to a small
+    # delta (added edges, removed route ids) that is folded back into the
+    # arrays once it grows past COMPACT_FRACTION of the graph. Edits and
+    # compaction are made by one writer at a time (apply_change and the
+    # catch-up in get_network hold the module lock); searches run alongside them without locking.
+    offsets = _csr_property('offsets')
+    edge_data = _csr_property('edge_data')
+    rev_offsets = _csr_property('rev_offsets')
+    rev_sources = _csr_property('rev_sources')
+    rev_edges = _csr_property('rev_edges')
+    id_order = _csr_property('id_order')
+    sorted_ids = _csr_property('sorted_ids')
+    targets = _field_property('target')
+    weights = _field_property('weight')
+    accessible = _field_property('accessible')
+    route_ids = _field_property('route_id')
+
+    def __init__(self, routes=()):
+        # locations are numbered by the catalogue, so both views, their
+        # route tables and the matrix workers all share one id space
+        self.names, self.index = catalogue.id_table()
+        self.landmarks = None
+        # held by edits, and by a background landmark build to install its
+        # result only if no edit came in meanwhile
+        self.lock = threading.RLock()
+        self._landmarks_building = None
+        self.version = 0
+        self.paths = {}
+        sources, targets, weights, accessible, route_ids = [], [], [], [], []
+        for r in routes:
+            sources.append(self.location_id(r['start_location']))
+            targets.append(self.location_id(r['end_location']))
+            weights.append(float(r['distance_m']))
+            accessible.append(bool(r['accessible']))
+            route_ids.append(int(r['id']))
+        self._set_arrays(
+            np.array(sources, dtype=np.int64),
+            np.array(targets, dtype=np.int64),
+            np.array(weights, dtype=np.float64),
+            np.array(accessible, dtype=bool),
+            np.array(route_ids, dtype=np.int64)
+        )
+
+    @classmethod
+    def from_arrays(cls, sources, targets, weights, accessible, route_ids):
+        # sources and targets are catalogue ids
+        graph = cls()
+        graph._set_arrays(sources, targets, weights, accessible, route_ids)
+        return graph
+
+    def _set_arrays(self, sources, targets, weights, accessible, route_ids):
+        n = len(self.names)
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+        # one packed record per edge, so a node's out-edges come back from a single slice
+        edge_data = np.empty(len(order), dtype=EDGE_DTYPE)
+        edge_data['target'] = targets[order]
+        edge_data['weight'] = weights[order]
+        edge_data['accessible'] = accessible[order]
+        edge_data['route_id'] = route_ids[order]
+
+        reverse = np.argsort(edge_data['target'], kind='stable')
+        rev_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_data['target'], minlength=n), out=rev_offsets[1:])
+        id_order = np.argsort(edge_data['route_id'], kind='stable').astype(np.int32)
+
+        self._arrays = _Arrays({
+            'offsets': offsets,
+            'edge_data': edge_data,
+            'rev_offsets': rev_offsets,
+            'rev_sources': np.ascontiguousarray(sources[order][reverse], dtype=np.int32),
+            'rev_edges': reverse.astype(np.int32),
+            'id_order': id_order,
+            'sorted_ids': edge_data['route_id'][id_order]
+        }, n)
+        self.edge_count = len(edge_data)
+
+    @classmethod
+    def from_snapshot(cls, ids, arrays):
+        # ids maps the snapshot's location numbers to catalogue ids. Where
+        # they agree, as they do in a process that loads the network before
+        # naming anything else, the CSR arrays are adopted as they are, so
+        # mmap-backed views stay shared; otherwise they are renumbered.
+        graph = cls()
+        graph._arrays = _Arrays(arrays, len(arrays['offsets']) - 1)
+        graph.edge_count = len(graph._arrays.edge_data)
+        if not np.array_equal(ids, np.arange(len(ids))):
+            sources, targets, weights, accessible, route_ids = graph.edge_arrays()
+            graph._set_arrays(ids[sources], ids[targets], weights, accessible, route_ids)
+        elif 'landmarks' in arrays:
+            graph.landmarks = [(array('d', forward.tobytes()), array('d', backward.tobytes())) for forward, backward in arrays['landmarks']]
+        return graph
+
+    def snapshot_arrays(self):
+        # only called with the module lock held, so compacting here cannot
+        # race an edit
+        self.compact()
+        current = self._arrays
+        arrays = {key: getattr(current, key) for key in SNAPSHOT_ARRAYS}
+        if self.landmarks:
+            arrays['landmarks'] = np.array([[forward, backward] for forward, backward in self.landmarks], dtype=np.float64)
+        return arrays
+
+    def location_id(self, name):
+        return catalogue.intern(name)
+
+    def node(self, name):
+        # id of name if this view has a route from or to it, else None
+        u = self.index.get(name)
+        if u is None:
+            return None
+        current = self._arrays
+        if current.added.get(u) or current.added_in.get(u):
+            return u
+        if u < current.nodes and (current.offsets[u + 1] > current.offsets[u] or current.rev_offsets[u + 1] > current.rev_offsets[u]):
+            return u
+        return None
+
+    def edges(self, u):
+        current = self._arrays
+        out = []
+        if u < current.nodes:
+            lo = current.offsets[u]
+            hi = current.offsets[u + 1]
+            if hi > lo:
+                out = current.edge_data[lo:hi].tolist()
+                if current.removed:
+                    out = [e for e in out if e[3] not in current.removed]
+        extra = current.added.get(u)
+        return out + extra if extra else out
+
+    def in_edges(self, v):
+        current = self._arrays
+        out = []
+        if v < current.nodes:
+            lo = current.rev_offsets[v]
+            hi = current.rev_offsets[v + 1]
+            if hi > lo:
+                out = [
+                    (x,) + edge[1:]
+                    for x, edge in zip(current.rev_sources[lo:hi].tolist(), current.edge_data[current.rev_edges[lo:hi]].tolist())
+                ]
+                if current.removed:
+                    out = [e for e in out if e[3] not in current.removed]
+        extra = current.added_in.get(v)
+        return out + extra if extra else out
+
+    def route(self, route_id):
+        current = self._arrays
+        found = current.added_routes.get(route_id)
+        if found is not None or route_id in current.removed:
+            return found
+        k = int(np.searchsorted(current.sorted_ids, route_id))
+        if k == len(current.sorted_ids) or current.sorted_ids[k] != route_id:
+            return None
+        pos = int(current.id_order[k])
+        u = int(np.searchsorted(current.offsets, pos, side='right')) - 1
+        target, weight, accessible, _ = current.edge_data[pos].tolist()
+        return u, (target, weight, accessible, route_id)
+
+    def _folded(self, current):
+        # (sources, targets, weights, accessible, route_ids) of current with
+        # its pending edits folded in; new arrays, nothing is changed
+        removed = set(current.removed)
+        added = list(current.added_routes.values())
+        data = current.edge_data
+        sources = np.repeat(np.arange(current.nodes, dtype=np.int64), np.diff(current.offsets))
+        if not removed and not added:
+            return sources, data['target'].copy(), data['weight'].copy(), data['accessible'].copy(), data['route_id'].copy()
+        keep = ~np.isin(data['route_id'], np.fromiter(removed, dtype=np.int64, count=len(removed)))
+        return (
+            np.concatenate([sources[keep], np.array([u for u, _ in added], dtype=np.int64)]),
+            np.concatenate([data['target'][keep], np.array([e[0] for _, e in added], dtype=np.int32)]),
+            np.concatenate([data['weight'][keep], np.array([e[1] for _, e in added], dtype=np.float64)]),
+            np.concatenate([data['accessible'][keep], np.array([e[2] for _, e in added], dtype=bool)]),
+            np.concatenate([data['route_id'][keep], np.array([e[3] for _, e in added], dtype=np.int32)])
+        )
+
+    def edge_arrays(self):
+        # every edge as (sources, targets, weights, accessible, route_ids),
+        # read from one generation without compacting the shared graph
+        return self._folded(self._arrays)
+
+    def csr_arrays(self):
+        # (offsets, targets, weights) with pending edits folded in, likewise
+        current = self._arrays
+        if not current.pending():
+            return current.offsets, current.edge_data['target'], current.edge_data['weight']
+        sources, targets, weights, _, _ = self._folded(current)
+        n = max(len(self.names), current.nodes)
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+        return offsets, targets[order], weights[order]
+
+    def compact(self):
+        # writers only: callers hold the module lock or own the graph
+        current = self._arrays
+        if current.pending():
+            self._set_arrays(*self._folded(current))
+
+    def _changed(self):
+        self.version += 1
+        self.paths = {}
+        current = self._arrays
+        if len(current.added_routes) + len(current.removed) > max(COMPACT_MIN, self.edge_count * COMPACT_FRACTION):
+            self.compact()
+
+    def add_route(self, route):
+        with self.lock:
+            u = self.location_id(route['start_location'])
+            v = self.location_id(route['end_location'])
+            edge = (v, float(route['distance_m']), bool(route['accessible']), int(route['id']))
+            current = self._arrays
+            current.added.setdefault(u, []).append(edge)
+            current.added_in.setdefault(v, []).append((u,) + edge[1:])
+            current.added_routes[edge[3]] = (u, edge)
+            self.edge_count += 1
+            # a new edge can shorten paths, so the landmark bounds are no longer safe
+            self.landmarks = None
+            self._changed()
+
+    def remove_route(self, route_id):
+        with self.lock:
+            found = self.route(route_id)
+            if found is None:
+                return None
+            u, edge = found
+            current = self._arrays
+            if current.added_routes.pop(route_id, None) is not None:
+                current.added[u].remove(edge)
+                current.added_in[edge[0]].remove((u,) + edge[1:])
+            else:
+                current.removed.add(route_id)
+            self.edge_count -= 1
+            # removing an edge only lengthens paths, so landmark bounds stay admissible
+            self._changed()
+            return found
+
+    def update_route(self, route):
+        with self.lock:
+            landmarks = self.landmarks
+            old = self.remove_route(int(route['id']))
+            self.add_route(route)
+            u, edge = self.route(int(route['id']))
+            if old is not None and (u, edge[0]) == (old[0], old[1][0]) and edge[1] >= old[1][1]:
+                # same endpoints and no shorter than before: the old bounds still hold
+                self.landmarks = landmarks
+
+    def to_records(self, locations=None):
+        # routes as dicts in id order; with locations (names), only those
+        # starting or ending at one of them, picked out on the arrays so
+        # only the routes returned are turned into dicts
+        sources, targets, weights, accessible, route_ids = self.edge_arrays()
+        keep = np.argsort(route_ids, kind='stable')
+        if locations is not None:
+            wanted = np.array([self.index[name] for name in locations if name in self.index], dtype=np.int64)
+            keep = keep[np.isin(sources[keep], wanted) | np.isin(targets[keep], wanted)]
+        names = self.names
+        return [
+            {
+                'id': route_id,
+                'start_location': names[u],
+                'end_location': names[v],
+                'distance_m': distance,
+                'accessible': flag
+            }
+            for route_id, u, v, distance, flag in zip(
+                route_ids[keep].tolist(), sources[keep].tolist(), targets[keep].tolist(), weights[keep].tolist(), accessible[keep].tolist()
+            )
+        ]
+
+    def locations(self):
+        sources, targets, _, _, _ = self.edge_arrays()
+        return sorted(self.names[u] for u in np.union1d(sources, targets).tolist())
+
+    def _leg(self, u, edge):
+        v, distance, accessible, route_id = edge
+        return {
+            'id': route_id,
+            'start_location': self.names[u],
+            'end_location': self.names[v],
+            'distance_m': distance,
+            'accessible': accessible
+        }
+
+    def _distances_from(self, source, edges):
+        dist = array('d', [INF]) * len(self.names)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for edge in edges(u):
+                v = edge[0]
+                nd = d + edge[1]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def _find_landmarks(self, count):
+        # ALT preprocessing: pick far-apart landmarks and store exact distances
+        # to and from each of them, giving admissible A* lower bounds.
+        landmarks = []
+        n = len(self.names)
+        if n:
+            spread = self._distances_from(0, self.edges)
+            chosen = max(range(n), key=lambda v: spread[v] if spread[v] < INF else -1.0)
+            nearest = [INF] * n
+            for _ in range(min(count, n)):
+                forward = self._distances_from(chosen, self.edges)
+                backward = self._distances_from(chosen, self.in_edges)
+                landmarks.append((forward, backward))
+                for v in range(n):
+                    reach = forward[v] + backward[v]
+                    if reach < nearest[v]:
+                        nearest[v] = reach
+                candidates = [v for v in range(n) if 0 < nearest[v] < INF]
+                if not candidates:
+                    break
+                chosen = max(candidates, key=nearest.__getitem__)
+        return landmarks
+
+    def build_landmarks(self, count=LANDMARKS):
+        # for a graph nobody else is using yet, such as one being loaded
+        self.landmarks = self._find_landmarks(count)
+        return self.landmarks
+
+    def _build_landmarks_later(self):
+        # Builds landmarks for the current version in a background thread.
+        # They are installed only if the graph is still at that version, so
+        # bounds computed before an edit never outlive it.
+        with self.lock:
+            version = self.version
+            if self._landmarks_building == version:
+                return
+            self._landmarks_building = version
+
+        def build():
+            landmarks = self._find_landmarks(LANDMARKS)
+            with self.lock:
+                if self.version == version and self.landmarks is None:
+                    self.landmarks = landmarks
+        threading.Thread(target=build, daemon=True).start()
+
+    def _potential(self, target):
+        landmarks = self.landmarks
+        if landmarks is None:
+            # an edit dropped them: plain Dijkstra until the rebuild lands,
+            # rather than building them inside this query
+            self._build_landmarks_later()
+            return _no_potential
+        bounds = [(forward, backward, forward[target], backward[target]) for forward, backward in landmarks]
+
+        def potential(v):
+            best = 0.0
+            for forward, backward, to_target, from_target in bounds:
+                x = to_target - forward[v]
+                if x > best:
+                    best = x
+                x = backward[v] - from_target
+                if x > best:
+                    best = x
+            return best
+        return potential
+
+    def _search(self, source, target, blocked_nodes=(), blocked_routes=(), deadline=None):
+        edges = self.edges
+        potential = self._potential(target)
+        estimates = {}
+        dist = {source: 0.0}
+        prev = {}
+        heap = [(potential(source), 0.0, source)]
+        pops = 0
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u == target:
+                break
+            if d > dist[u]:
+                continue
+            pops += 1
+            if deadline is not None and pops % 256 == 0 and time.monotonic() > deadline:
+                raise SearchTimeout()
+            for edge in edges(u):
+                v = edge[0]
+                if v in blocked_nodes or edge[3] in blocked_routes:
+                    continue
+                nd = d + edge[1]
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    prev[v] = (u, edge)
+                    h = estimates.get(v)
+                    if h is None:
+                        h = estimates[v] = potential(v)
+                    heapq.heappush(heap, (nd + h, nd, v))
+
+        if target not in dist:
+            return None
+
+        steps = []
+        node = target
+        while node != source:
+            step = prev[node]
+            steps.append(step)
+            node = step[0]
+        steps.reverse()
+        return steps
+
+    def _result(self, source, steps):
+        legs = [self._leg(u, edge) for u, edge in steps]
+        return {
+            'locations': [self.names[source]] + [leg['end_location'] for leg in legs],
+            'legs': legs,
+            'distance_m': sum(leg['distance_m'] for leg in legs),
+            'accessible': all(leg['accessible'] for leg in legs)
+        }
+
+    def _closed_ids(self, closed_locations, *endpoints):
+        # closed locations cannot be passed through, but can still be the start or end of a trip
+        return {self.index[name] for name in closed_locations if name in self.index and name not in endpoints}
+
+    def shortest_path(self, start, end, closed_locations=(), closed_routes=()):
+        source = self.node(start)
+        target = self.node(end)
+        if closed_locations or closed_routes:
+            # closures are applied as an overlay, so results bypass the memo
+            if source is None or target is None:
+                return None
+            steps = self._search(source, target, self._closed_ids(closed_locations, start, end), set(closed_routes))
+            return None if steps is None else self._result(source, steps)
+
+        key = (start, end)
+        paths = self.paths
+        if key in paths:
+            return paths[key]
+        if source is None or target is None:
+            return None
+        steps = self._search(source, target)
+        result = None if steps is None else self._result(source, steps)
+        # an edit during the search replaced self.paths; the result may
+        # predate it, so it goes into the dropped memo only
+        if len(paths) >= PATH_CACHE_SIZE:
+            paths.clear()
+        paths[key] = result
+        return result
+
+    def reachable(self, start, max_distance, closed_locations=(), closed_routes=()):
+        source = self.node(start)
+        if source is None:
+            return []
+        blocked = self._closed_ids(closed_locations, start)
+
+        edges = self.edges
+        dist = {source: 0.0}
+        settled = []
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > max_distance:
+                break
+            if d > dist[u]:
+                continue
+            settled.append((self.names[u], d))
+            if u in blocked:
+                continue
+            for edge in edges(u):
+                v = edge[0]
+                if edge[3] in closed_routes:
+                    continue
+                nd = d + edge[1]
+                if nd <= max_distance and nd < dist.get(v, INF):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return settled
+
+    def k_shortest_paths(self, start, end, k=ALTERNATIVES, time_budget=TIME_BUDGET, closed_locations=(), closed_routes=()):
+        # Yen's algorithm; parallel routes count as distinct alternatives, and
+        # whatever has been found when the time budget runs out is returned.
+        source = self.node(start)
+        target = self.node(end)
+        if source is None or target is None or k < 1:
+            return []
+
+        closed_ids = self._closed_ids(closed_locations, start, end)
+        closed_routes = set(closed_routes)
+        deadline = time.monotonic() + time_budget
+        try:
+            first = self._search(source, target, closed_ids, closed_routes, deadline)
+        except SearchTimeout:
+            return []
+        if first is None:
+            return []
+
+        found = [first]
+        seen = {tuple(edge[3] for _, edge in first)}
+        candidates = []
+        try:
+            while len(found) < k:
+                previous = found[-1]
+                for i in range(len(previous)):
+                    # spur searches are often too short to reach their own
+                    # deadline check, so the budget is also checked between them
+                    if time.monotonic() > deadline:
+                        raise SearchTimeout()
+                    spur_node = previous[i][0]
+                    root = previous[:i]
+                    root_routes = [edge[3] for _, edge in root]
+                    blocked_routes = closed_routes | {
+                        path[i][1][3] for path in found
+                        if len(path) > i and [edge[3] for _, edge in path[:i]] == root_routes
+                    }
+                    blocked_nodes = closed_ids | {u for u, _ in root}
+                    spur = self._search(spur_node, target, blocked_nodes, blocked_routes, deadline)
+                    if spur is None:
+                        continue
+                    path = root + spur
+                    key = tuple(edge[3] for _, edge in path)
+                    if key not in seen:
+                        seen.add(key)
+                        heapq.heappush(candidates, (sum(edge[1] for _, edge in path), len(path), key, path))
+                if not candidates:
+                    break
+                found.append(heapq.heappop(candidates)[3])
+        except SearchTimeout:
+            pass
+
+        return [self._result(source, path) for path in found]
+
+
+class RouteNetwork:
+    def __init__(self, routes=()):
+        routes = list(routes)
+        # dataset version of the routes this network holds, set by the module
+        self.version = 0
+        self.full = RouteGraph(routes)
+        self.accessible = RouteGraph([r for r in routes if r['accessible']])
+
+    @classmethod
+    def from_arrays(cls, sources, targets, weights, accessible, route_ids):
+        network = cls()
+        network.full = RouteGraph.from_arrays(sources, targets, weights, accessible, route_ids)
+        network.accessible = RouteGraph.from_arrays(
+            sources[accessible], targets[accessible], weights[accessible], accessible[accessible], route_ids[accessible]
+        )
+        return network
+
+    def view(self, accessible_only=False):
+        return self.accessible if accessible_only else self.full
+
+    def add_route(self, route):
+        self.full.add_route(route)
+        if route['accessible']:
+            self.accessible.add_route(route)
+
+    def remove_route(self, route_id):
+        self.full.remove_route(route_id)
+        self.accessible.remove_route(route_id)
+
+    def update_route(self, route):
+        self.full.update_route(route)
+        if route['accessible']:
+            self.accessible.update_route(route)
+        else:
+            self.accessible.remove_route(int(route['id']))
+
+    def build_landmarks(self):
+        self.full.build_landmarks()
+        self.accessible.build_landmarks()
+
+    @classmethod
+    def from_snapshot(cls, arrays, strings):
+        if 'names' not in strings:
+            # written before both views shared one numbering
+            return None
+        ids = catalogue.ids(strings['names'])
+        network = cls()
+        for view in ('full', 'accessible'):
+            prefix = view + '.'
+            parts = {key[len(prefix):]: values for key, values in arrays.items() if key.startswith(prefix)}
+            setattr(network, view, RouteGraph.from_snapshot(ids, parts))
+        return network
+
+    def snapshot(self):
+        # location numbers in the file are catalogue ids of this process,
+        # with the names they stand for
+        arrays = {}
+        for view in ('full', 'accessible'):
+            graph = getattr(self, view)
+            for key, values in graph.snapshot_arrays().items():
+                arrays[view + '.' + key] = values
+        nodes = max(len(arrays[view + '.offsets']) - 1 for view in ('full', 'accessible'))
+        return arrays, {'names': self.full.names[:nodes]}
+
+
+_network = None
+_network_stamp = None
+# where the route log stood when _network was loaded or last caught up
+_route_cursor = None
+_version = 0
+_lock = threading.Lock()
+_snapshot_timer = None
+
+
+def _route_arrays(stamp):
+    # (sources, targets, weights, accessible, route_ids) of every route,
+    # without going through the storage cache: at millions of routes its
+    # records take far more memory than the graph built from them. Taken
+    # from the analytics Parquet snapshot when it is current, else streamed
+    # from the store a row at a time.
+    columns = columnar.read_current('routes', stamp, ['distance_m', 'accessible', 'id'], ['start_location', 'end_location'])
+    if columns is not None:
+        return (
+            columns['start_location'], columns['end_location'], columns['distance_m'].astype(np.float64),
+            columns['accessible'].astype(bool), columns['id'].astype(np.int64)
+        )
+    ids = {}
+    sources, targets, route_ids = array('q'), array('q'), array('q')
+    weights = array('d')
+    accessible = bytearray()
+    for r in repository.scan('routes'):
+        for name, out in ((r['start_location'], sources), (r['end_location'], targets)):
+            u = ids.get(name)
+            if u is None:
+                u = ids[name] = catalogue.intern(name)
+            out.append(u)
+        weights.append(r['distance_m'])
+        accessible.append(bool(r['accessible']))
+        route_ids.append(r['id'])
+    return (
+        np.frombuffer(sources, dtype=np.int64), np.frombuffer(targets, dtype=np.int64), np.frombuffer(weights, dtype=np.float64),
+        np.frombuffer(bytes(accessible), dtype=bool), np.frombuffer(route_ids, dtype=np.int64)
+    )
+
+
+def _load_network(stamp):
+    snap = snapshot.read(SNAPSHOT_PATH, stamp)
+    network = RouteNetwork.from_snapshot(*snap) if snap is not None else None
+    if network is not None:
+        return network
+    # no snapshot, or routes.csv is newer than it: build the graph from the
+    # route columns and snapshot it
+    network = RouteNetwork.from_arrays(*_route_arrays(stamp))
+    network.build_landmarks()
+    try:
+        snapshot.write(SNAPSHOT_PATH, stamp, *network.snapshot())
+    except OSError:
+        pass
+    return network
+
+
+def _holds(network, route_id, route):
+    # whether both views already have route_id as route (None: not at all)
+    for view in (False, True):
+        graph = network.view(view)
+        found = graph.route(route_id)
+        if route is None or (view and not route['accessible']):
+            if found is not None:
+                return False
+        elif found != (
+            graph.index.get(route['start_location']),
+            (graph.index.get(route['end_location']), float(route['distance_m']), bool(route['accessible']), route_id)
+        ):
+            return False
+    return True
+
+
+def _patch(network, route_id, route):
+    # sets route_id to route (None: deleted) in both graph views, then
+    # patches their all-pairs tables in place rather than rebuilding them;
+    # a table that could not be patched is rebuilt by the next query
+    if _holds(network, route_id, route):
+        return
+    before = {}
+    for view in (False, True):
+        graph = network.view(view)
+        before[view] = (graph.version, graph.route(route_id))
+    if route is None:
+        network.remove_route(route_id)
+    else:
+        network.update_route(route)
+    for view in (False, True):
+        graph = network.view(view)
+        old_version, old = before[view]
+        new = graph.route(route_id)
+        if old is not None or new is not None:
+            route_table.patch(view, graph, old_version, old, new)
+
+
+def _catch_up(stamp):
+    # Replays the route log since _route_cursor onto the loaded network, so
+    # an edit made by another worker is patched in like one of our own. The
+    # cursor is taken before the network is read, so an entry may already
+    # be in it; every entry sets a route outright, so replaying it again is
+    # harmless. False when the log cannot say what changed (a backend
+    # without one, a replaced table) or says too much.
+    global _network_stamp, _route_cursor, _version
+    changes, cursor = repository.tail_routes(_route_cursor)
+    if changes is None or len(changes) > CATCH_UP_MAX:
+        return False
+    for change in changes:
+        if change['op'] == 'delete':
+            _patch(_network, int(change['key']), None)
+        else:
+            route = change['record']
+            _patch(_network, int(route['id']), route)
+    _route_cursor = cursor
+    _network_stamp = stamp
+    _version += 1
+    _network.version = _version
+    return True
+
+
+def get_network():
+    global _network, _network_stamp, _route_cursor, _version
+    stamp = repository.stamp('routes')
+    if _network is not None and stamp == _network_stamp:
+        return _network
+    with _lock:
+        if _network is not None and stamp != _network_stamp and _catch_up(stamp):
+            return _network
+        if _network is None or stamp != _network_stamp:
+            _, _route_cursor = repository.tail_routes(None)
+            _network = _load_network(stamp)
+            _network_stamp = stamp
+            _version += 1
+            _network.version = _version
+        return _network
+
+
+def save_snapshot():
+    global _snapshot_timer
+    with _lock:
+        _snapshot_timer = None
+        if _network is None:
+            return
+        stamp = _network_stamp
+        arrays, strings = _network.snapshot()
+    try:
+        snapshot.write(SNAPSHOT_PATH, stamp, arrays, strings)
+    except OSError:
+        pass
+
+
+def _schedule_snapshot():
+    # bursts of edits are coalesced into one snapshot write
+    global _snapshot_timer
+    if _snapshot_timer is None:
+        _snapshot_timer = threading.Timer(SNAPSHOT_DELAY, save_snapshot)
+        _snapshot_timer.daemon = True
+        _snapshot_timer.start()
+
+
+def get_graph(accessible_only=False):
+    return get_network().view(accessible_only)
+
+
+def apply_change(route_id, route, written):
+    # This process has just written route_id (route None: deleted), written
+    # being the routes stamps before and after the write: patch the loaded
+    # network in place instead of re-reading it. The route log holds this
+    # write and any other that came first, so catching up from it covers
+    # both; without the log the write is patched in directly, provided
+    # nothing else was written before it.
+    global _network, _network_stamp, _version
+    with _lock:
+        if _network is not None and written is not None:
+            if _catch_up(written[1]):
+                _schedule_snapshot()
+                return
+            if written[0] == _network_stamp:
+                _patch(_network, route_id, route)
+                _network_stamp = written[1]
+                _version += 1
+                _network.version = _version
+                _schedule_snapshot()
+                return
+        _network = None
+        _network_stamp = None
+        _version += 1
+
+
+def dataset_version():
+    return get_network().version
+
+
+def invalidate():
+    global _network, _network_stamp
+    with _lock:
+        _network = None
+        _network_stamp = None
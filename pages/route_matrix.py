@@ -0,0 +1,178 @@
+import os
+import heapq
+import atexit
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from pages import route_graph, route_table, snapshot
+
+POOL_MIN_SOURCES = 32
+# one small pool per web worker, whatever the machine size
+POOL_WORKERS = min(4, os.cpu_count() or 1)
+# largest sources x targets a request may ask for, and with paths
+MAX_CELLS = 250000
+MAX_PATH_CELLS = 10000
+
+INF = float('inf')
+
+_pool = None
+_pool_lock = threading.Lock()
+# view -> (graph, version, path) of the CSR arrays last published for it
+_published = {}
+# published files, oldest first
+_retired = []
+# set in each worker process: path -> CSR arrays mapped from it
+_worker_csr = {}
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+        return _pool
+
+
+def _publish(view, graph):
+    # Pool workers read a view's CSR arrays from a snapshot file rather
+    # than having them pickled into every task: each version is written
+    # once and mapped by each worker the first time it is asked for. The
+    # file before the previous one is removed; a task that still names it
+    # is searched here instead.
+    with _pool_lock:
+        published = _published.get(view)
+        if published is not None and published[0] is graph and published[1] == graph.version:
+            return published[2]
+        version = graph.version
+        offsets, targets, weights = graph.csr_arrays()
+        fd, path = tempfile.mkstemp(prefix="route-matrix-", suffix=".snap")
+        os.close(fd)
+        snapshot.write(path, None, {'offsets': offsets, 'targets': targets, 'weights': weights})
+        _published[view] = (graph, version, path)
+        _retired.append(path)
+        while len(_retired) > 2:
+            _remove(_retired.pop(0))
+        return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@atexit.register
+def _cleanup():
+    for path in _retired:
+        _remove(path)
+
+
+def _worker_chunk(path, sources, want_paths):
+    csr = _worker_csr.get(path)
+    if csr is None:
+        arrays, _ = snapshot.read(path, None)
+        csr = (arrays['offsets'], arrays['targets'], arrays['weights'])
+        _worker_csr.clear()
+        _worker_csr[path] = csr
+    return _search_chunk(csr, sources, want_paths)
+
+
+def _single_source(csr, source, want_paths):
+    offsets, targets, weights = csr
+    n = len(offsets) - 1
+    dist = [INF] * n
+    prev = [-1] * n if want_paths else None
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        lo = offsets[u]
+        hi = offsets[u + 1]
+        for v, w in zip(targets[lo:hi].tolist(), weights[lo:hi].tolist()):
+            nd = d + w
+            if nd < dist[v]:
+                dist[v] = nd
+                if want_paths:
+                    prev[v] = u
+                heapq.heappush(heap, (nd, v))
+    return dist, prev
+
+
+def _search_chunk(csr, sources, want_paths):
+    return [_single_source(csr, s, want_paths) for s in sources]
+
+
+def _trace(prev, source, target):
+    nodes = [target]
+    while nodes[-1] != source:
+        nodes.append(prev[nodes[-1]])
+    nodes.reverse()
+    return nodes
+
+
+def _ids(graph, names):
+    # -1 for names with no route in this view
+    ids = [graph.node(name) for name in names]
+    return [-1 if i is None else i for i in ids]
+
+
+def distance_matrix(sources, targets, accessible_only=False, with_paths=False):
+    network = route_graph.get_network()
+    graph = network.view(accessible_only)
+    source_ids = _ids(graph, sources)
+    target_ids = _ids(graph, targets)
+    src = np.array(source_ids, dtype=np.int64)
+    tgt = np.array(target_ids, dtype=np.int64)
+    known_src = src >= 0
+    known_tgt = tgt >= 0
+
+    # float32 like the route table, so a pair gets the same distance
+    # whichever way it is served
+    distances = np.full((len(sources), len(targets)), np.inf, dtype=np.float32)
+    paths = [[None] * len(targets) for _ in sources] if with_paths else None
+
+    table = route_table.get_table(network, accessible_only)
+    if table is not None:
+        distances[np.ix_(known_src, known_tgt)] = table.dist[np.ix_(src[known_src], tgt[known_tgt])]
+        if with_paths:
+            for i, s in enumerate(sources):
+                for j, t in enumerate(targets):
+                    if distances[i, j] < np.inf:
+                        paths[i][j] = table.shortest_path(s, t)['locations']
+        return {'sources': list(sources), 'targets': list(targets), 'distances': distances, 'paths': paths}
+
+    # one single-source search per distinct origin, fanned out to worker processes
+    origins = sorted({s for s in source_ids if s >= 0})
+    if len(origins) >= POOL_MIN_SOURCES and POOL_WORKERS > 1:
+        path = _publish(bool(accessible_only), graph)
+        size = -(-len(origins) // POOL_WORKERS)
+        chunks = [origins[i:i + size] for i in range(0, len(origins), size)]
+        pool = _get_pool()
+        futures = [(chunk, pool.submit(_worker_chunk, path, chunk, with_paths)) for chunk in chunks]
+        results = []
+        for chunk, future in futures:
+            try:
+                results.extend(future.result())
+            except (OSError, TypeError):
+                # the file was retired before the worker mapped it
+                results.extend(_search_chunk(graph.csr_arrays(), chunk, with_paths))
+    else:
+        results = _search_chunk(graph.csr_arrays(), origins, with_paths)
+    searched = dict(zip(origins, results))
+
+    cols = tgt[known_tgt]
+    for i, s in enumerate(source_ids):
+        if s < 0:
+            continue
+        dist, prev = searched[s]
+        distances[i, known_tgt] = np.asarray(dist)[cols]
+        if with_paths:
+            for j, t in enumerate(target_ids):
+                if t >= 0 and dist[t] < INF:
+                    paths[i][j] = [graph.names[v] for v in _trace(prev, s, t)]
+
+    return {'sources': list(sources), 'targets': list(targets), 'distances': distances, 'paths': paths}
@@ -0,0 +1,278 @@
+import os
+import heapq
+import threading
+import numpy as np
+
+ENABLED = os.environ.get("ROUTE_TABLE", "on").lower() not in ("0", "off", "false")
+# a table costs n * n * 8 bytes per graph view, and each worker keeps one
+# for the full and one for the accessible view: 4000 locations is 128 MB a
+# view, 256 MB a worker
+MAX_LOCATIONS = int(os.environ.get("ROUTE_TABLE_MAX_LOCATIONS", "4000"))
+PATCH_BLOCK_ROWS = 512
+
+INF = float('inf')
+
+
+class RouteTable:
+    def __init__(self, graph):
+        self.graph = graph
+        self.version = graph.version
+        self.lock = threading.Lock()
+        n = len(graph.names)
+
+        # float32 distances and int32 first-hop route ids: 8 bytes per pair
+        self.dist = np.full((n, n), np.inf, dtype=np.float32)
+        self.first_route = np.full((n, n), -1, dtype=np.int32)
+        for source in range(n):
+            self._fill_row(source)
+
+    def _fill_row(self, source):
+        edges = self.graph.edges
+        # the catalogue may have named more locations since the table was
+        # sized; they have no routes here until a patch grows it
+        n = self.dist.shape[0]
+
+        dist = [INF] * n
+        first = [-1] * n
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for edge in edges(u):
+                v = edge[0]
+                nd = d + edge[1]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    first[v] = edge[3] if u == source else first[u]
+                    heapq.heappush(heap, (nd, v))
+
+        self.dist[source] = dist
+        self.first_route[source] = first
+
+    def grow(self, n):
+        old = self.dist.shape[0]
+        if n <= old:
+            return
+        dist = np.full((n, n), np.inf, dtype=np.float32)
+        first = np.full((n, n), -1, dtype=np.int32)
+        dist[:old, :old] = self.dist
+        first[:old, :old] = self.first_route
+        dist[np.arange(old, n), np.arange(old, n)] = 0.0
+        self.dist = dist
+        self.first_route = first
+
+    def insert_edge(self, u, edge):
+        # A new or shorter edge u -> v can only help pairs (i, j) whose path
+        # becomes i ~> u -> v ~> j, so one vectorised relaxation covers them all.
+        v, distance, _, route_id = edge
+        to_u = self.dist[:, u].copy()
+        from_v = self.dist[v, :].copy()
+        rows = np.nonzero(to_u < np.inf)[0]
+        cols = np.nonzero(from_v < np.inf)[0]
+        if not len(rows) or not len(cols):
+            return 0
+
+        updated = 0
+        tail = from_v[cols] + np.float32(distance)
+        for start in range(0, len(rows), PATCH_BLOCK_ROWS):
+            block = rows[start:start + PATCH_BLOCK_ROWS]
+            candidate = to_u[block][:, None] + tail[None, :]
+            better = candidate < self.dist[np.ix_(block, cols)]
+            if not better.any():
+                continue
+            bi, bj = np.nonzero(better)
+            ri = block[bi]
+            rj = cols[bj]
+            self.dist[ri, rj] = candidate[bi, bj]
+            hops = self.first_route[ri, u]
+            hops[ri == u] = route_id
+            self.first_route[ri, rj] = hops
+            updated += len(ri)
+        return updated
+
+    def remove_edge(self, u, edge):
+        # A removed or longer edge u -> v can only hurt sources whose shortest
+        # path to v ran over it and that have no other equally short way in.
+        v, distance, _, _ = edge
+        to_v = self.dist[:, v].astype(np.float64)
+        slack = np.maximum(np.abs(to_v) * 1e-6, 1e-3)
+        tight = self.dist[:, u].astype(np.float64) + distance <= to_v + slack
+        for x, w, _, _ in self.graph.in_edges(v):
+            if w > 0:
+                tight &= ~(self.dist[:, x].astype(np.float64) + w <= to_v + slack)
+        affected = np.nonzero(tight)[0]
+        if len(affected):
+            # per source, only targets reached through u -> v can have moved
+            through = self.dist[affected, u].astype(np.float64)[:, None] + distance + self.dist[v, :].astype(np.float64)[None, :]
+            current = self.dist[affected, :].astype(np.float64)
+            moved = through <= current + np.maximum(np.abs(current) * 1e-6, 1e-3)
+            for k, source in enumerate(affected):
+                self._repair_row(int(source), set(np.nonzero(moved[k])[0].tolist()))
+
+        # the other rows keep their distances, but a first hop may now lead
+        # through a recomputed row (or over the removed route itself)
+        stale = self._stale_rows()
+        for source in stale:
+            self._fill_row(int(source))
+        return len(affected) + len(stale)
+
+    def _repair_row(self, source, targets):
+        # Dijkstra restricted to the targets whose old path used the removed
+        # edge, seeded from their in-edges that come from unaffected nodes
+        in_edges = self.graph.in_edges
+        edges = self.graph.edges
+        row = self.dist[source].tolist()
+        first = self.first_route[source]
+
+        dist = {}
+        hop = {}
+        heap = []
+        for j in targets:
+            best = INF
+            best_hop = -1
+            for x, w, _, route_id in in_edges(j):
+                if x in targets or row[x] + w >= best:
+                    continue
+                best = row[x] + w
+                best_hop = route_id if x == source else int(first[x])
+            dist[j] = best
+            hop[j] = best_hop
+            if best < INF:
+                heapq.heappush(heap, (best, j))
+
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            for v, w, _, _ in edges(x):
+                if v in targets and d + w < dist[v]:
+                    dist[v] = d + w
+                    hop[v] = hop[x]
+                    heapq.heappush(heap, (d + w, v))
+
+        cols = np.fromiter(dist.keys(), dtype=np.int64, count=len(dist))
+        self.dist[source, cols] = np.fromiter(dist.values(), dtype=np.float64, count=len(dist))
+        self.first_route[source, cols] = np.fromiter(hop.values(), dtype=np.int64, count=len(hop))
+
+    def _stale_rows(self):
+        graph = self.graph
+        _, targets, weights, _, route_ids = graph.edge_arrays()
+        if not len(targets):
+            return np.nonzero((self.first_route >= 0).any(axis=1))[0]
+        order = np.argsort(route_ids, kind='stable')
+        ids = route_ids[order].astype(np.int64)
+        heads = targets[order].astype(np.int64)
+        weights = weights[order].astype(np.float64)
+
+        n = self.dist.shape[0]
+        stale = []
+        for start in range(0, n, PATCH_BLOCK_ROWS):
+            first = self.first_route[start:start + PATCH_BLOCK_ROWS].astype(np.int64)
+            dist = self.dist[start:start + PATCH_BLOCK_ROWS].astype(np.float64)
+            has_hop = first >= 0
+            pos = np.minimum(np.searchsorted(ids, first), len(ids) - 1)
+            known = ids[pos] == first
+            cols = np.broadcast_to(np.arange(n), first.shape)
+            expected = weights[pos] + self.dist[heads[pos], cols]
+            with np.errstate(invalid='ignore'):
+                ok = known & (np.abs(expected - dist) <= np.maximum(np.abs(dist) * 1e-6, 1e-3))
+            bad = (has_hop & ~ok).any(axis=1)
+            stale.extend((np.nonzero(bad)[0] + start).tolist())
+        return stale
+
+    def distance(self, start, end):
+        u = self.graph.node(start)
+        v = self.graph.node(end)
+        if u is None or v is None:
+            return None
+        d = self.dist[u, v]
+        return None if d == np.inf else float(d)
+
+    def shortest_path(self, start, end):
+        u = self.graph.node(start)
+        target = self.graph.node(end)
+        with self.lock:
+            if u is None or target is None or self.dist[u, target] == np.inf:
+                return None
+
+            route = self.graph.route
+            legs = []
+            while u != target:
+                edge_u, edge = route(int(self.first_route[u, target]))
+                legs.append(self.graph._leg(edge_u, edge))
+                u = edge[0]
+
+        return {
+            'locations': [start] + [leg['end_location'] for leg in legs],
+            'legs': legs,
+            'distance_m': sum(leg['distance_m'] for leg in legs),
+            'accessible': all(leg['accessible'] for leg in legs)
+        }
+
+
+_tables = {}
+_building = {}
+_lock = threading.Lock()
+
+
+def _is_current(table, graph):
+    return table is not None and table.graph is graph and table.version == graph.version
+
+
+def _build(view, graph, version):
+    try:
+        table = RouteTable(graph)
+        # discard the table if the graph was edited while it was being built
+        if table.version == version == graph.version:
+            _tables[view] = table
+    finally:
+        with _lock:
+            if _building.get(view) == (graph, version):
+                del _building[view]
+
+
+def rebuild(network, background=True):
+    for view in (False, True):
+        graph = network.view(view)
+        if not ENABLED or len(graph.names) > MAX_LOCATIONS or _is_current(_tables.get(view), graph):
+            continue
+        version = graph.version
+        with _lock:
+            if _building.get(view) == (graph, version):
+                continue
+            _building[view] = (graph, version)
+        if background:
+            threading.Thread(target=_build, args=(view, graph, version), daemon=True).start()
+        else:
+            _build(view, graph, version)
+
+
+def patch(view, graph, old_version, old, new):
+    # old and new are the route's (start id, edge) before and after the edit;
+    # the graph itself has already been updated
+    table = _tables.get(view)
+    if table is None or table.graph is not graph or table.version != old_version:
+        return False
+    if len(graph.names) > MAX_LOCATIONS:
+        _tables.pop(view, None)
+        return False
+    with table.lock:
+        table.grow(len(graph.names))
+        if old is not None:
+            table.remove_edge(*old)
+        if new is not None:
+            table.insert_edge(*new)
+        table.version = graph.version
+    return True
+
+
+def get_table(network, accessible_only=False):
+    # tables are built lazily: the first query that finds none current
+    # starts a background build and is answered from the graph meanwhile
+    table = _tables.get(accessible_only)
+    if _is_current(table, network.view(accessible_only)):
+        return table
+    rebuild(network)
+    return None
@@ -0,0 +1,85 @@
+from pages import repository, route_graph, route_table, closures
+from pages.route_cache import LRUCache
+
+_MISSING = object()
+# values are (result, keys of the closures it was detoured around)
+path_cache = LRUCache()
+
+
+def _touches(result, closure):
+    if result is None:
+        return False
+    if closure['location'] is not None and closure['location'] in result['locations'][1:-1]:
+        return True
+    return closure['route_id'] is not None and any(leg['id'] == closure['route_id'] for leg in result['legs'])
+
+
+def _closure_changed(event, closure):
+    if event == 'added':
+        path_cache.evict(lambda key, value: _touches(value[0], closure))
+    else:
+        path_cache.evict(lambda key, value: closure['key'] in value[1])
+
+
+closures.add_listener(_closure_changed)
+
+
+def find_path(start, end, accessible_only=False):
+    active, closed_locations, closed_routes = closures.blocked()
+    generation = closures.generation()
+    # the version comes from the network searched, so a result is never
+    # stored under a version older than the routes it was found on
+    network = route_graph.get_network()
+    version = network.version
+    key = (start, end, bool(accessible_only), version)
+    cached = path_cache.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached[0]
+
+    graph = network.view(accessible_only)
+    table = route_table.get_table(network, accessible_only)
+    if table is not None:
+        result = table.shortest_path(start, end)
+    else:
+        result = graph.shortest_path(start, end)
+
+    # closures only remove edges, so an open shortest path that avoids them is still shortest
+    detoured = frozenset()
+    if any(_touches(result, c) for c in active):
+        result = graph.shortest_path(start, end, closed_locations, closed_routes)
+        detoured = frozenset(c['key'] for c in active)
+
+    # and not stored at all if an edit patched the network meanwhile
+    if generation == closures.generation() and version == network.version:
+        path_cache.put(key, (result, detoured))
+    return result
+
+
+def cache_stats():
+    return path_cache.stats()
+
+
+def find_alternatives(start, end, accessible_only=False, k=route_graph.ALTERNATIVES):
+    _, closed_locations, closed_routes = closures.blocked()
+    return route_graph.get_graph(accessible_only).k_shortest_paths(
+        start, end, k, closed_locations=closed_locations, closed_routes=closed_routes
+    )
+
+
+def find_reachable(start, max_distance, accessible_only=False):
+    _, closed_locations, closed_routes = closures.blocked()
+    return route_graph.get_graph(accessible_only).reachable(start, max_distance, closed_locations, closed_routes)
+
+
+def route_saved(route):
+    route_graph.apply_change(int(route['id']), route, repository.last_write('routes'))
+
+
+def route_deleted(route_id):
+    route_graph.apply_change(route_id, None, repository.last_write('routes'))
+
+
+def routes_imported():
+    # too many routes changed to patch one by one: the next query reloads
+    # the network and starts rebuilding the tables
+    route_graph.invalidate()
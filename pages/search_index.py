@@ -0,0 +1,213 @@
+import operator
+import threading
+from array import array
+import numpy as np
+from pages import storage
+
+# Trigram index behind the search boxes. Every record gets a slot; for each
+# three-character piece of its lowercased field values the index keeps the
+# slots containing it. A search looks up the trigrams of the query, starts
+# from the rarest and intersects, then checks just those candidates, so it
+# costs about the size of the rarest trigram's list rather than a pass over
+# the table. Queries shorter than a trigram fall back to checking every
+# record.
+#
+# Writes made in this process reach the index through storage.add_listener
+# and are applied in place when they follow on from the state it holds.
+# Otherwise the next search catches up: from the append log for tables
+# that have one, else by indexing the table again.
+GRAM = 3
+# columns left out of search
+HIDDEN = {'users': ('password',)}
+# candidates few enough to check directly instead of intersecting further
+CHECK_ROWS = 64
+# intersecting with a list this many times longer than the candidates
+# costs more than checking them
+CHECK_RATIO = 32
+# records per numpy pass when indexing a whole table
+BUILD_ROWS = 1 << 15
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class SearchIndex:
+    def __init__(self, table):
+        self.table = table
+        self.key = storage.TABLES[table]['key']
+        self.columns = [name for name in storage.fields(table) if name not in HIDDEN.get(table, ())]
+        self.values = operator.attrgetter(*self.columns)
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.cursor = None
+        self._clear()
+
+    def _clear(self):
+        self.records = []
+        self.slots = {}
+        self.postings = {}
+        self.dead = 0
+
+    def _text(self, record):
+        return [str(value).lower() for value in self.values(record)]
+
+    def _record_grams(self, record):
+        grams = set()
+        for value in self._text(record):
+            grams |= _grams(value)
+        return grams
+
+    def _put(self, key, record):
+        # add, update or delete (record None) by key; applying a change
+        # twice is harmless
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            if record is None:
+                return
+            slot = len(self.records)
+            self.records.append(None)
+            old = set()
+        else:
+            old = self._record_grams(self.records[slot])
+            if record is None:
+                self.records[slot] = None
+                self.dead += 1
+                return
+        self.records[slot] = record
+        self.slots[record[self.key]] = slot
+        # grams the slot already lists stay; a stale one only costs a check
+        for gram in self._record_grams(record) - old:
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = array('i')
+            postings.append(slot)
+
+    def _build(self, records):
+        # What _put does record by record, as numpy passes over chunks of
+        # BUILD_ROWS records: each (trigram, slot) pair is packed into one
+        # int64, 16 bits per character and 15 for the slot within the chunk,
+        # so a plain sort groups the lists and leaves each in slot order.
+        # A chunk with characters outside the BMP goes record by record.
+        self._clear()
+        records = list(records)
+        for start in range(0, len(records), BUILD_ROWS):
+            chunk = records[start:start + BUILD_ROWS]
+            texts = ["\0".join(map(str, self.values(record))).lower() for record in chunk]
+            chars = np.frombuffer("\0".join(texts).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32).astype(np.int64)
+            if len(chars) and chars.max() > 0xFFFF:
+                for record in chunk:
+                    self._put(record[self.key], record)
+                continue
+            self.records.extend(chunk)
+            self.slots.update(zip(map(operator.itemgetter(self.key), chunk), range(start, start + len(chunk))))
+            offsets = np.repeat(np.arange(len(texts), dtype=np.int64), [len(t) + 1 for t in texts])[:len(chars)]
+            keys = (chars[:-2] << 47) | (chars[1:-1] << 31) | (chars[2:] << 15) | offsets[:-2]
+            keys = keys[(chars[:-2] != 0) & (chars[1:-1] != 0) & (chars[2:] != 0)]
+            if not len(keys):
+                continue
+            keys.sort()
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+            codes = keys >> 15
+            slots = (keys & 0x7FFF).astype(np.int32) + start
+            bounds = np.concatenate(([0], np.flatnonzero(codes[1:] != codes[:-1]) + 1, [len(codes)])).tolist()
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                code = int(codes[lo])
+                gram = chr(code >> 32) + chr((code >> 16) & 0xFFFF) + chr(code & 0xFFFF)
+                postings = self.postings.get(gram)
+                if postings is None:
+                    postings = self.postings[gram] = array('i')
+                postings.frombytes(slots[lo:hi].tobytes())
+
+    def _apply(self, changes):
+        for key, record in changes:
+            self._put(key, record)
+        if self.dead > max(1024, len(self.slots)):
+            # mostly deletions: index the live records again, in order
+            self._build([r for r in self.records if r is not None])
+
+    def changed(self, written, changes):
+        with self.lock:
+            if self.stamp is None or self.stamp != written[0]:
+                return
+            if changes is None:
+                self.stamp = None
+                return
+            self._apply(changes)
+            self.stamp = written[1]
+
+    def refresh(self):
+        # Catches up with writes made elsewhere. Never runs with self.lock
+        # held while it reads the store: storage calls changed() under its
+        # own lock. A cursor taken before the stamp, and a stamp before the
+        # records, can only make a later catch-up replay a change twice.
+        backend = storage.get_storage()
+        with self.lock:
+            stamp, cursor = self.stamp, self.cursor
+        current = backend.stamp(self.table)
+        if stamp is not None and current == stamp:
+            return
+        if stamp is not None:
+            entries, cursor = backend.tail(self.table, cursor)
+            if entries is not None:
+                changes = [self._entry_change(entry) for entry in entries]
+                with self.lock:
+                    if self.stamp == stamp:
+                        self._apply(changes)
+                        self.stamp, self.cursor = current, cursor
+                return
+
+        _, cursor = backend.tail(self.table, None)
+        current = backend.stamp(self.table)
+        fresh = SearchIndex(self.table)
+        fresh._build(backend.records(self.table))
+        with self.lock:
+            self.records, self.slots, self.postings, self.dead = fresh.records, fresh.slots, fresh.postings, fresh.dead
+            self.stamp, self.cursor = current, cursor
+
+    def _entry_change(self, entry):
+        if entry['op'] == 'delete':
+            return entry['key'], None
+        record = storage.TABLES[self.table]['record'].from_row(entry['record'])
+        return record[self.key], record
+
+    def _candidates(self, grams):
+        # slots holding every gram, or close enough to check directly
+        postings = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        if not postings[0]:
+            return []
+        candidates = np.frombuffer(postings[0], dtype=np.int32)
+        for more in postings[1:]:
+            if len(candidates) <= CHECK_ROWS or len(more) > CHECK_RATIO * len(candidates):
+                break
+            candidates = np.intersect1d(candidates, np.frombuffer(more, dtype=np.int32), assume_unique=True)
+        return np.unique(candidates).tolist()
+
+    def search(self, text):
+        # records with a searchable field containing text, case-insensitively,
+        # in table order
+        text = text.lower()
+        self.refresh()
+        with self.lock:
+            grams = _grams(text)
+            candidates = self._candidates(grams) if grams else range(len(self.records))
+            found = []
+            for slot in candidates:
+                record = self.records[slot]
+                if record is not None and any(text in value for value in self._text(record)):
+                    found.append(record)
+            return found
+
+
+_indexes = {table: SearchIndex(table) for table in storage.TABLES}
+
+
+def _changed(table, written, changes):
+    _indexes[table].changed(written, changes)
+
+
+storage.add_listener(_changed)
+
+
+def search(table, text):
+    return _indexes[table].search(text)
@@ -0,0 +1,42 @@
+import threading
+from pages import fileio
+
+
+class Sequence:
+    # Persisted id counter kept in a small side file. Every allocation holds
+    # a cross-process file lock, so two workers never hand out the same id,
+    # and none of them scans the table: initial() is only consulted when the
+    # counter file does not exist yet.
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, value):
+        # replaced by rename, so a crash mid-write cannot leave an empty
+        # counter to be seeded again from initial()
+        with fileio.atomic_write(self.path) as f:
+            f.write(str(value))
+
+    def reserve(self, initial, count=1):
+        # reserves count consecutive ids and returns the first of them
+        with self.lock, fileio.file_lock(self.path):
+            current = self._read()
+            if current is None:
+                current = initial()
+            self._write(current + count)
+            return current + 1
+
+    def advance(self, value):
+        # ids up to value are taken (inserted explicitly, or restored in
+        # bulk) and must not be handed out again; the counter never goes back
+        with self.lock, fileio.file_lock(self.path):
+            current = self._read()
+            if current is None or current < value:
+                self._write(value)
@@ -1,8 +1,7 @@
 from dash import html, dcc, Input, Output, State
 import dash
 import hashlib
-import csv
-import os
+from pages import repository
 
 dash.register_page(__name__, path="/signup")
 
@@ -195,17 +194,7 @@ def signup(n, username, email, password, role, consent):
         return "You must agree to GDPR data consent before signing up."
 
     hashed_pw = hash_password(password)
-    file_path = "data/user_data.csv"
-
-    file_exists = os.path.isfile(file_path)
-
-    with open(file_path, "a", newline="") as f:
-        writer = csv.writer(f)
-
-        if not file_exists:
-            writer.writerow(["username", "email", "role", "password", "consent"])
-
-        writer.writerow([username, email, role, hashed_pw, "yes"])
+    repository.add_user({"username": username, "email": email, "role": role, "password": hashed_pw})
 
     return "Account Created Successfully! Please Login."
 
@@ -218,17 +207,6 @@ def signup(n, username, email, password, role):
         return "Please fill all fields!"
 
     hashed_pw = hash_password(password)
-
-    file_path = "data/user_data.csv"
-
-    file_exists = os.path.isfile(file_path)
-
-    with open(file_path, "a", newline="") as f:
-        writer = csv.writer(f)
-
-        if not file_exists:
-            writer.writerow(["username", "email", "role", "password"])
-
-        writer.writerow([username, email, role, hashed_pw])
+    repository.add_user({"username": username, "email": email, "role": role, "password": hashed_pw})
 
     return "Account Created Successfully! Please Login."
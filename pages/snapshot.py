@@ -0,0 +1,101 @@
+import os
+import json
+import mmap
+import struct
+import numpy as np
+from pages import fileio
+
+# Binary snapshot layout:
+#   magic (8 bytes) | format version (u32) | header length (u32) | JSON header
+#   then each array at an 8-byte aligned offset given in the header.
+# String tables are stored as two arrays, '<name>.offsets' (u64) and
+# '<name>.blob' (utf-8 bytes). The header records the storage stamp of the
+# table the snapshot was built from; a snapshot whose stamp does not match
+# the table's current one is treated as missing.
+MAGIC = b'CAMPSNAP'
+FORMAT_VERSION = 1
+PREFIX = struct.Struct('<8sII')
+ALIGN = 8
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _pack_strings(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _unpack_strings(offsets, blob):
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+
+def write(path, stamp, arrays, strings=None):
+    arrays = dict(arrays)
+    for name, values in (strings or {}).items():
+        arrays[name + '.offsets'], arrays[name + '.blob'] = _pack_strings(values)
+
+    entries = {}
+    offset = 0
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        arrays[name] = values
+        entries[name] = {
+            'dtype': np.lib.format.dtype_to_descr(values.dtype),
+            'shape': list(values.shape),
+            'offset': offset
+        }
+        offset += -(-values.nbytes // ALIGN) * ALIGN
+    header = json.dumps({
+        'stamp': list(stamp) if stamp is not None else None,
+        'strings': sorted(strings or ()),
+        'arrays': entries
+    }).encode('utf-8')
+    start = -(-(PREFIX.size + len(header)) // ALIGN) * ALIGN
+
+    with fileio.atomic_write(path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, values in arrays.items():
+            f.seek(start + entries[name]['offset'])
+            f.write(values.tobytes())
+        f.truncate(start + offset)
+
+
+def read(path, stamp):
+    # Arrays come back as read-only views of a shared mapping, so every worker
+    # process that loads the same snapshot shares its pages.
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mapped) < PREFIX.size:
+        return None
+    magic, version, header_len = PREFIX.unpack_from(mapped, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    header = json.loads(mapped[PREFIX.size:PREFIX.size + header_len].decode('utf-8'))
+    if header['stamp'] != (list(stamp) if stamp is not None else None):
+        return None
+
+    start = -(-(PREFIX.size + header_len) // ALIGN) * ALIGN
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.lib.format.descr_to_dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=start + entry['offset']).reshape(entry['shape'])
+    strings = {}
+    for name in header['strings']:
+        strings[name] = _unpack_strings(arrays.pop(name + '.offsets'), arrays.pop(name + '.blob'))
+    return arrays, strings
+
@@ -0,0 +1,808 @@
+import os
+import sys
+import csv
+import json
+import uuid
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+from pages import fileio, records as record_types, snapshot, versions
+from pages.append_log import AppendLog
+from pages.sequence import Sequence
+
+BACKEND = os.environ.get("STORAGE_BACKEND", "csv").lower()
+SQLITE_PATH = os.environ.get("STORAGE_DB", "data/campus.db")
+LOG_COMPACT_BYTES = 8 * 1024 * 1024
+# SQLite keeps this many of the latest change entries per logged table
+LOG_KEEP_ENTRIES = 10000
+NUMPY_TYPES = {int: np.int64, float: np.float64, bool: bool}
+# batches larger than this drop the cached table instead of growing it
+PATCH_ROWS = 1000
+# how often a read looks at the CSV itself for edits made outside the app
+FILE_CHECK_INTERVAL = 1.0
+
+TABLES = {
+    'routes': {
+        'csv': "data/routes.csv",
+        'log': "data/routes.log",
+        'key': 'id',
+        'record': record_types.Route,
+        'columns': record_types.Route.COLUMNS,
+        'indexes': [('start_location', 'end_location'), ('end_location',)]
+    },
+    'locations': {
+        'csv': "data/locations.csv",
+        'snapshot': "data/locations.snap",
+        'key': 'id',
+        'record': record_types.Location,
+        'columns': record_types.Location.COLUMNS,
+        'indexes': [('building', 'floor')]
+    },
+    'users': {
+        'csv': "data/user_data.csv",
+        'key': 'username',
+        'record': record_types.User,
+        'columns': record_types.User.COLUMNS,
+        'indexes': [('username',)]
+    },
+    'notifications': {
+        'csv': "data/notification.csv",
+        'log': "data/notification.log",
+        'key': 'id',
+        'record': record_types.Notification,
+        'columns': record_types.Notification.COLUMNS,
+        'indexes': [('user_id',)]
+    },
+    # when each closure notification was first seen (pages/closures.py)
+    'closures': {
+        'csv': "data/closures.csv",
+        'key': 'notification_id',
+        'record': record_types.Closure,
+        'columns': record_types.Closure.COLUMNS,
+        'indexes': []
+    }
+}
+
+
+class DuplicateKey(Exception):
+    pass
+
+
+_listeners = []
+_local = threading.local()
+
+
+def add_listener(fn):
+    # fn(table, written, changes) after every write through a backend in
+    # this process: written is (stamp before, stamp after) and changes a
+    # list of (key, record) with record None for a delete, or None when the
+    # whole table was replaced
+    _listeners.append(fn)
+
+
+def last_written(table):
+    # (stamp before, stamp after) of the latest write to table made by the
+    # calling thread, or None
+    return getattr(_local, 'written', {}).get(table)
+
+
+def _notify(table, written, changes):
+    if not hasattr(_local, 'written'):
+        _local.written = {}
+    _local.written[table] = written
+    for fn in _listeners:
+        fn(table, written, changes)
+
+
+def fields(table):
+    return [name for name, _ in TABLES[table]['columns']]
+
+
+def _has_sequence(table):
+    return TABLES[table]['key'] == 'id'
+
+
+def _assign_ids(storage, table, records):
+    # new records get ids from the table's sequence in one reservation;
+    # explicit ids move the sequence past them
+    if not _has_sequence(table):
+        return
+    missing = [r for r in records if r.get('id') is None]
+    if missing:
+        first = storage._reserve_ids(table, len(missing))
+        for offset, record in enumerate(missing):
+            record['id'] = first + offset
+    if len(missing) < len(records):
+        storage._advance_ids(table, max(r['id'] for r in records))
+
+
+def _matches(record, filters):
+    return all(record[name] == value for name, value in filters.items())
+
+
+def _bounded_lines(f, size):
+    # the lines of a binary file up to byte size, decoded; a line that runs
+    # past size was appended after the caller pinned its view and is dropped
+    remaining = size
+    for line in f:
+        if len(line) > remaining:
+            return
+        remaining -= len(line)
+        yield line.decode('utf-8')
+
+
+def _parse(table, row):
+    return TABLES[table]['record'].from_row(row)
+
+
+class Storage:
+    # Records (pages/records.py) are cached per table together with the
+    # stamp they were read at. A stamp is (instance, version) of a per-table
+    # counter that every write bumps, so checking a cache costs one read of
+    # it. A read only goes back
+    # to the backend when the stamp has moved, and writes made through this
+    # object patch the cached list in place. Records are never modified, so
+    # the cached ones are handed out as they are.
+    def __init__(self):
+        self._cache = {}
+        self.lock = threading.RLock()
+
+    def records(self, table):
+        stamp = self.stamp(table)
+        with self.lock:
+            entry = self._cache.get(table)
+            if entry is None or entry[0] != stamp:
+                with self._locked(table, exclusive=False), record_types.bulk():
+                    stamp = self.stamp(table)
+                    entry = self._cache[table] = (stamp, self._reload(table, entry, stamp))
+            return entry[1]
+
+    def scan(self, table, filters=None):
+        # records matching filters ({column: value}), one at a time, for
+        # callers that stream a table out instead of holding all of it
+        for record in list(self.records(table)):
+            if _matches(record, filters or {}):
+                yield record
+
+    @contextmanager
+    def _locked(self, table, exclusive=True):
+        yield
+
+    def _reload(self, table, entry, stamp):
+        return self._load(table, stamp)
+
+    def tail(self, table, cursor):
+        # (changes since cursor, new cursor); changes is None when the caller
+        # has to re-read the whole table instead
+        stamp = self.stamp(table)
+        return (None if stamp != cursor else []), stamp
+
+    def _invalidate(self, table):
+        self._cache.pop(table, None)
+
+    def _patched(self, table, written, patch):
+        # written is (stamp just before, stamp just after) our own write; the
+        # cache is patched only if it held exactly the state we wrote over
+        before, after = written
+        entry = self._cache.get(table)
+        if entry is not None and entry[0] == before:
+            patch(entry[1])
+            self._cache[table] = (after, entry[1])
+        else:
+            # someone else wrote in between: reload on the next read
+            self._cache.pop(table, None)
+
+    def reserve_ids(self, table, count=1):
+        # a block of ids for callers that build records before inserting them
+        with self.lock, self._locked(table):
+            first = self._reserve_ids(table, count)
+            return range(first, first + count)
+
+    def insert(self, table, record):
+        with self.lock, self._locked(table):
+            record = dict(record)
+            _assign_ids(self, table, [record])
+            record = self._insert(table, _parse(table, record))
+            written = self._written(table)
+            self._patched(table, written, lambda records: records.append(record))
+            _notify(table, written, [(record[TABLES[table]['key']], record)])
+            return record
+
+    def insert_many(self, table, records):
+        # one lock round trip and, where the backend allows, one write for
+        # the whole batch
+        with self.lock, self._locked(table):
+            records = [dict(r) for r in records]
+            _assign_ids(self, table, records)
+            records = self._insert_many(table, [_parse(table, r) for r in records])
+            written = self._written(table)
+            if len(records) > PATCH_ROWS:
+                self._invalidate(table)
+            else:
+                self._patched(table, written, lambda rows: rows.extend(records))
+            name = TABLES[table]['key']
+            _notify(table, written, [(r[name], r) for r in records])
+            return records
+
+    def _insert_many(self, table, records):
+        return [self._insert(table, r) for r in records]
+
+    def update(self, table, key, record):
+        name = TABLES[table]['key']
+        record = _parse(table, record)
+        with self.lock, self._locked(table):
+            if not self._update(table, key, record):
+                return False
+            written = self._written(table)
+
+            def patch(records):
+                for i, r in enumerate(records):
+                    if r[name] == key:
+                        records[i] = record
+            self._patched(table, written, patch)
+            _notify(table, written, [(key, record)])
+            return True
+
+    def delete(self, table, key):
+        name = TABLES[table]['key']
+        with self.lock, self._locked(table):
+            if not self._delete(table, key):
+                return False
+            written = self._written(table)
+
+            def patch(records):
+                records[:] = [r for r in records if r[name] != key]
+            self._patched(table, written, patch)
+            _notify(table, written, [(key, None)])
+            return True
+
+    def replace(self, table, records):
+        with self.lock, self._locked(table):
+            records = [_parse(table, r) for r in records]
+            self._replace(table, records)
+            written = self._written(table)
+            self._cache[table] = (written[1], records)
+            _notify(table, written, None)
+
+
+class CsvStorage(Storage):
+    # Tables with a 'log' path (routes, notifications) are stored as the CSV
+    # plus an append-only log of add/update/delete entries, folded back into
+    # the CSV once the log passes LOG_COMPACT_BYTES.
+    def __init__(self):
+        super().__init__()
+        self._logs = {table: AppendLog(spec['log']) for table, spec in TABLES.items() if spec.get('log')}
+        self._sequences = {table: Sequence(spec['csv'] + ".seq") for table, spec in TABLES.items() if _has_sequence(table)}
+        self._versions = versions.VersionFile()
+        self._log_offsets = {}
+        self._csv_stamps = {}
+        self._appended = {}
+        self._compacting = set()
+        self._held = set()
+        self._file_checks = {}
+        for table in TABLES:
+            self._reconcile(table)
+
+    @contextmanager
+    def _locked(self, table, exclusive=True):
+        # Cross-process advisory lock around every read-modify-write (and a
+        # shared one around loads). In-process callers are already serialised
+        # by self.lock, so nested calls for a table reuse the lock held.
+        if table in self._held:
+            yield
+            return
+        self._held.add(table)
+        try:
+            with fileio.file_lock(TABLES[table]['csv'], exclusive):
+                # a CSV edited by hand since the last write must be reloaded
+                # before anything is rewritten from the cache
+                self._reconcile(table)
+                yield
+        finally:
+            self._held.discard(table)
+
+    def stamp(self, table):
+        if time.monotonic() >= self._file_checks.get(table, 0):
+            self._reconcile(table)
+        return self._versions.get(table)
+
+    def _reconcile(self, table):
+        # The counter only moves on writes made through a backend, so the
+        # CSV's (mtime, size) is compared with the one recorded at the last
+        # bump: under the table lock before every load and read-modify-write,
+        # and at most every FILE_CHECK_INTERVAL on reads. A file changed any
+        # other way bumps the counter, which drops every cache of it.
+        self._file_checks[table] = time.monotonic() + FILE_CHECK_INTERVAL
+        self._versions.reconcile(table, snapshot.file_stamp(TABLES[table]['csv']))
+
+    def _written(self, table):
+        # every change to a table's files ends here, under its exclusive lock
+        return self._versions.bump(table, snapshot.file_stamp(TABLES[table]['csv']))
+
+    def _read_csv(self, table):
+        records = []
+        if os.path.exists(TABLES[table]['csv']):
+            with open(TABLES[table]['csv'], "r", newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    records.append(_parse(table, row))
+        return records
+
+    def _load(self, table, stamp):
+        log = self._logs.get(table)
+        if log is not None:
+            # replayed by key, so entries already folded into the CSV by an
+            # interrupted compaction apply harmlessly a second time
+            name = TABLES[table]['key']
+            self._csv_stamps[table] = snapshot.file_stamp(TABLES[table]['csv'])
+            records = {r[name]: r for r in self._read_csv(table)}
+            entries, self._log_offsets[table] = log.read(0)
+            for entry in entries:
+                if entry['op'] == 'delete':
+                    records.pop(entry['key'], None)
+                else:
+                    records[entry['record'][name]] = _parse(table, entry['record'])
+            return list(records.values())
+
+        path = TABLES[table].get('snapshot')
+        if path:
+            snap = snapshot.read(path, stamp)
+            if snap is not None:
+                return _records_from_snapshot(table, *snap)
+        records = self._read_csv(table)
+        if path:
+            # no snapshot, or the CSV is newer than it: rebuild it
+            _write_snapshot(table, stamp, records)
+        return records
+
+    def _reload(self, table, entry, stamp):
+        log = self._logs.get(table)
+        offset = self._log_offsets.get(table)
+        if (log is None or entry is None or offset is None or log.size() < offset
+                or snapshot.file_stamp(TABLES[table]['csv']) != self._csv_stamps.get(table)):
+            return self._load(table, stamp)
+        # only the log has grown: replay just the new tail
+        entries, self._log_offsets[table] = log.read(offset)
+        records = entry[1]
+        for change in entries:
+            _apply_change(table, records, change)
+        return records
+
+    def tail(self, table, cursor):
+        log = self._logs.get(table)
+        if log is None:
+            return super().tail(table, cursor)
+        base = snapshot.file_stamp(TABLES[table]['csv'])
+        if cursor is None or cursor[0] != base:
+            return None, (base, log.size())
+        entries, offset = log.read(cursor[1])
+        return entries, (base, offset)
+
+    def scan(self, table, filters=None):
+        # Streams the CSV from disk instead of the cache. The view is pinned
+        # under a brief shared lock: the open handle keeps reading the file
+        # it was opened on even if a rewrite renames over it, and rows
+        # appended afterwards lie past the size taken here.
+        filters = filters or {}
+        name = TABLES[table]['key']
+        log = self._logs.get(table)
+        changes = {}
+        with self.lock, self._locked(table, exclusive=False):
+            try:
+                f = open(TABLES[table]['csv'], "rb")
+            except FileNotFoundError:
+                f = None
+            size = os.fstat(f.fileno()).st_size if f else 0
+            if log is not None:
+                # the log is bounded by compaction, so its net effect is
+                # small enough to hold: key -> latest record, or None if deleted
+                for entry in log.read(0, log.size())[0]:
+                    if entry['op'] == 'delete':
+                        changes[entry['key']] = None
+                    else:
+                        record = _parse(table, entry['record'])
+                        changes[record[name]] = record
+        if f is not None:
+            with f:
+                for row in csv.DictReader(_bounded_lines(f, size)):
+                    record = _parse(table, row)
+                    if record[name] in changes:
+                        record = changes.pop(record[name])
+                        if record is None:
+                            continue
+                    if _matches(record, filters):
+                        yield record
+        for record in changes.values():
+            if record is not None and _matches(record, filters):
+                yield record
+
+    def _write(self, table, records):
+        with fileio.atomic_write(TABLES[table]['csv'], "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields(table), extrasaction="ignore")
+            writer.writeheader()
+            for r in records:
+                writer.writerow(r)
+
+    def _invalidate(self, table):
+        super()._invalidate(table)
+        self._appended.pop(table, None)
+        self._log_offsets.pop(table, None)
+
+    def _patched(self, table, written, patch):
+        log = self._logs.get(table)
+        if log is not None:
+            start, end = self._appended.pop(table)
+            entry = self._cache.get(table)
+            if entry is not None and entry[0] == written[0] and start == self._log_offsets.get(table):
+                patch(entry[1])
+                self._cache[table] = (written[1], entry[1])
+                self._log_offsets[table] = end
+            else:
+                self._cache.pop(table, None)
+            if end > LOG_COMPACT_BYTES and table not in self._compacting:
+                self._compacting.add(table)
+                threading.Thread(target=self.compact, args=(table,), daemon=True).start()
+            return
+
+        super()._patched(table, written, patch)
+        entry = self._cache.get(table)
+        if entry is not None and TABLES[table].get('snapshot'):
+            _write_snapshot(table, entry[0], entry[1])
+
+    def _append(self, table, change):
+        self._appended[table] = self._logs[table].append(change)
+
+    def _reserve_ids(self, table, count):
+        # the table scan only runs the first time, to seed the counter file
+        return self._sequences[table].reserve(lambda: max((r['id'] for r in self.records(table)), default=0), count)
+
+    def _advance_ids(self, table, value):
+        self._sequences[table].advance(value)
+
+    def _insert(self, table, record):
+        return self._insert_many(table, [record])[0]
+
+    def _insert_many(self, table, records):
+        if table in self._logs:
+            self._appended[table] = self._logs[table].extend([{'op': 'add', 'record': r.to_dict()} for r in records])
+            return records
+
+        path = TABLES[table]['csv']
+        header = None
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "r", newline="", encoding="utf-8") as f:
+                header = next(csv.reader(f), None)
+        if not header:
+            self._write(table, records)
+            return records
+
+        # new rows are appended under the file's own header instead of rewriting it
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) not in (b"\n", b"\r")
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            if needs_newline:
+                f.write("\r\n")
+            csv.DictWriter(f, fieldnames=header, extrasaction="ignore").writerows(records)
+        return records
+
+    def _update(self, table, key, record):
+        name = TABLES[table]['key']
+        records = self.records(table)
+        if not any(r[name] == key for r in records):
+            return False
+        if table in self._logs:
+            self._append(table, {'op': 'update', 'record': record.to_dict()})
+            return True
+        self._write(table, [record if r[name] == key else r for r in records])
+        return True
+
+    def _delete(self, table, key):
+        name = TABLES[table]['key']
+        records = self.records(table)
+        if not any(r[name] == key for r in records):
+            return False
+        if table in self._logs:
+            self._append(table, {'op': 'delete', 'key': key})
+            return True
+        self._write(table, [r for r in records if r[name] != key])
+        return True
+
+    def _replace(self, table, records):
+        self._write(table, records)
+        log = self._logs.get(table)
+        if log is not None:
+            log.truncate()
+            self._log_offsets[table] = 0
+            self._csv_stamps[table] = snapshot.file_stamp(TABLES[table]['csv'])
+        if _has_sequence(table) and records:
+            self._advance_ids(table, max(r['id'] for r in records))
+
+    def replace(self, table, records):
+        with self.lock:
+            super().replace(table, records)
+            if TABLES[table].get('snapshot'):
+                _write_snapshot(table, *self._cache[table])
+
+    def compact(self, table):
+        # fold the log back into the CSV; appends wait on the lock meanwhile
+        try:
+            with self.lock, self._locked(table):
+                records = list(self.records(table))
+                self._write(table, records)
+                self._logs[table].truncate()
+                self._log_offsets[table] = 0
+                self._csv_stamps[table] = snapshot.file_stamp(TABLES[table]['csv'])
+                written = self._written(table)
+                self._cache[table] = (written[1], records)
+                # same rows, new files
+                _notify(table, written, [])
+        finally:
+            self._compacting.discard(table)
+
+
+def _apply_change(table, records, change):
+    name = TABLES[table]['key']
+    if change['op'] == 'add':
+        records.append(_parse(table, change['record']))
+    elif change['op'] == 'update':
+        record = _parse(table, change['record'])
+        for i, r in enumerate(records):
+            if r[name] == record[name]:
+                records[i] = record
+    else:
+        records[:] = [r for r in records if r[name] != change['key']]
+
+
+def _snapshot_arrays(table, records):
+    arrays = {}
+    strings = {}
+    for name, kind in TABLES[table]['columns']:
+        values = [r[name] for r in records]
+        if kind is str:
+            strings[name] = values
+        else:
+            arrays[name] = np.array(values, dtype=NUMPY_TYPES[kind])
+    return arrays, strings
+
+
+def _records_from_snapshot(table, arrays, strings):
+    columns = []
+    for name, kind in TABLES[table]['columns']:
+        columns.append(strings[name] if kind is str else arrays[name].tolist())
+    return [TABLES[table]['record'](*values) for values in zip(*columns)]
+
+
+def _write_snapshot(table, stamp, records):
+    try:
+        snapshot.write(TABLES[table]['snapshot'], stamp, *_snapshot_arrays(table, records))
+    except OSError:
+        pass
+
+
+class SqliteStorage(Storage):
+    SQL_TYPES = {int: "INTEGER", float: "REAL", bool: "INTEGER", str: "TEXT"}
+
+    def __init__(self, path=SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._instance = None
+        self._versions_written = {}
+        self._create_schema()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('instance', ?)", (uuid.uuid4().hex,))
+            # every table carries a version counter bumped by triggers, which
+            # is what readers compare instead of a file mtime
+            conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # the add/update/delete entries of tables with a 'log', written in
+            # the same transaction as the change, for tail()
+            conn.execute("CREATE TABLE IF NOT EXISTS change_log (seq INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, entry TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_name ON change_log (name, seq)")
+            for table, spec in TABLES.items():
+                columns = []
+                for name, kind in spec['columns']:
+                    column = "%s %s" % (name, self.SQL_TYPES[kind])
+                    if name == spec['key'] and kind is int:
+                        column += " PRIMARY KEY"
+                    columns.append(column)
+                conn.execute("CREATE TABLE IF NOT EXISTS %s (%s)" % (table, ", ".join(columns)))
+                for index in spec['indexes']:
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_%s_%s ON %s (%s)" % (table, "_".join(index), table, ", ".join(index)))
+                conn.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+                if _has_sequence(table):
+                    conn.execute("INSERT OR IGNORE INTO sequences (name, value) SELECT ?, COALESCE(MAX(id), 0) FROM %s" % table, (table,))
+                for event in ("INSERT", "UPDATE", "DELETE"):
+                    conn.execute(
+                        "CREATE TRIGGER IF NOT EXISTS %s_%s_version AFTER %s ON %s BEGIN "
+                        "UPDATE table_versions SET version = version + 1 WHERE name = '%s'; END"
+                        % (table, event.lower(), event, table, table)
+                    )
+        self._instance = conn.execute("SELECT value FROM meta WHERE key = 'instance'").fetchone()[0]
+
+    def stamp(self, table):
+        return self._version(self.connection(), table)
+
+    def _version(self, conn, table):
+        row = conn.execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+        return self._instance, row[0]
+
+    @contextmanager
+    def _transaction(self, table):
+        # a write transaction that notes the table's version on both sides
+        # of the write, read inside it so no other writer can slip between
+        conn = self.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = self._version(conn, table)
+            yield conn
+            self._versions_written[table] = (before, self._version(conn, table))
+
+    def _written(self, table):
+        return self._versions_written.pop(table)
+
+    def _log(self, conn, table, entries):
+        if not TABLES[table].get('log'):
+            return
+        conn.executemany(
+            "INSERT INTO change_log (name, entry) VALUES (?, ?)",
+            [(table, json.dumps(e, separators=(',', ':'))) for e in entries]
+        )
+        conn.execute(
+            "DELETE FROM change_log WHERE name = ? AND seq < "
+            "(SELECT seq FROM change_log WHERE name = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+            (table, table, LOG_KEEP_ENTRIES - 1)
+        )
+
+    def tail(self, table, cursor):
+        # The cursor is (instance, table version, last entry seq). Every row
+        # a write touches bumps the version once and, for a logged write,
+        # adds one entry, so entries that do not account for the whole
+        # version gap mean a replace, a pruned entry or a write from outside.
+        if not TABLES[table].get('log'):
+            return super().tail(table, cursor)
+        conn = self.connection()
+        with conn:
+            conn.execute("BEGIN")
+            instance, version = self._version(conn, table)
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            rows = []
+            if cursor is not None and cursor[0] == instance:
+                rows = conn.execute(
+                    "SELECT entry FROM change_log WHERE name = ? AND seq > ? AND seq <= ? ORDER BY seq",
+                    (table, cursor[2], seq)
+                ).fetchall()
+        if cursor is None or cursor[0] != instance or cursor[1] + len(rows) != version:
+            return None, (instance, version, seq)
+        return [json.loads(row[0]) for row in rows], (instance, version, seq)
+
+    def _load(self, table, stamp):
+        names = fields(table)
+        rows = self.connection().execute("SELECT %s FROM %s ORDER BY rowid" % (", ".join(names), table))
+        return [_parse(table, dict(zip(names, row))) for row in rows]
+
+    def scan(self, table, filters=None):
+        # a connection of its own, so the read transaction can stay open
+        # across yields; under WAL it does not hold up writers
+        filters = filters or {}
+        names = fields(table)
+        unknown = [name for name in filters if name not in names]
+        if unknown:
+            raise ValueError("unknown columns: " + ", ".join(unknown))
+        where = " WHERE " + " AND ".join("%s = ?" % name for name in filters) if filters else ""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cursor = conn.execute("SELECT %s FROM %s%s ORDER BY rowid" % (", ".join(names), table, where), list(filters.values()))
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _parse(table, dict(zip(names, row)))
+        finally:
+            conn.close()
+
+    def _reserve_ids(self, table, count):
+        # the UPDATE takes the database write lock, so concurrent workers
+        # get disjoint blocks
+        with self.connection() as conn:
+            value = conn.execute("UPDATE sequences SET value = value + ? WHERE name = ? RETURNING value", (count, table)).fetchone()[0]
+        return value - count + 1
+
+    def _advance_ids(self, table, value):
+        with self.connection() as conn:
+            conn.execute("UPDATE sequences SET value = MAX(value, ?) WHERE name = ?", (value, table))
+
+    def _insert(self, table, record):
+        return self._insert_many(table, [record])[0]
+
+    def _insert_many(self, table, records):
+        # a single transaction instead of one commit per row
+        names = fields(table)
+        try:
+            with self._transaction(table) as conn:
+                conn.executemany(
+                    "INSERT INTO %s (%s) VALUES (%s)" % (table, ", ".join(names), ", ".join("?" * len(names))),
+                    [[r.get(name) for name in names] for r in records]
+                )
+                self._log(conn, table, [{'op': 'add', 'record': r.to_dict()} for r in records])
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKey(str(e))
+        return records
+
+    def _update(self, table, key, record):
+        names = fields(table)
+        with self._transaction(table) as conn:
+            cursor = conn.execute(
+                "UPDATE %s SET %s WHERE %s = ?" % (table, ", ".join("%s = ?" % name for name in names), TABLES[table]['key']),
+                [record.get(name) for name in names] + [key]
+            )
+            if cursor.rowcount:
+                self._log(conn, table, [{'op': 'update', 'record': record.to_dict()}])
+        return cursor.rowcount > 0
+
+    def _delete(self, table, key):
+        with self._transaction(table) as conn:
+            cursor = conn.execute("DELETE FROM %s WHERE %s = ?" % (table, TABLES[table]['key']), (key,))
+            if cursor.rowcount:
+                self._log(conn, table, [{'op': 'delete', 'key': key}])
+        return cursor.rowcount > 0
+
+    def _replace(self, table, records):
+        names = fields(table)
+        with self._transaction(table) as conn:
+            conn.execute("DELETE FROM %s" % table)
+            conn.execute("DELETE FROM change_log WHERE name = ?", (table,))
+            conn.executemany(
+                "INSERT INTO %s (%s) VALUES (%s)" % (table, ", ".join(names), ", ".join("?" * len(names))),
+                [[r.get(name) for name in names] for r in records]
+            )
+            if _has_sequence(table) and records:
+                conn.execute("UPDATE sequences SET value = MAX(value, ?) WHERE name = ?", (max(r['id'] for r in records), table))
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = SqliteStorage() if BACKEND == "sqlite" else CsvStorage()
+        return _storage
+
+
+def migrate_csv(path=SQLITE_PATH):
+    # one-shot copy of every data/*.csv table into the SQLite database
+    source = CsvStorage()
+    target = SqliteStorage(path)
+    counts = {}
+    for table in TABLES:
+        records = source.records(table)
+        target.replace(table, records)
+        counts[table] = len(records)
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("usage: python -m pages.storage migrate [database]")
+        sys.exit(1)
+    for table, count in migrate_csv(*sys.argv[2:3]).items():
+        print("%s: %d rows" % (table, count))
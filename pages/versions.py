@@ -0,0 +1,122 @@
+import os
+import sys
+import mmap
+import uuid
+import struct
+import threading
+from pages import fileio
+
+# A small file shared by every worker process and memory-mapped by each of
+# them, holding one version counter per dataset. Every save bumps the
+# counter, and a cache checks whether it is still current with one read of
+# the mapping: no stat() and no system call.
+#
+# Layout: magic | instance uuid (16 bytes) | MAX_SLOTS slots of
+#   name (32 bytes) | version (u64) | mtime_ns (i64) | size (i64)
+# The instance changes whenever the file is recreated, so a stamp taken
+# from an older file never matches. Each slot also records the data file's
+# (mtime_ns, size) as of its last bump, so an edit made any other way (by
+# hand, or a git checkout) is caught by reconcile(), which the CSV backend
+# runs at startup, under the table lock and periodically on reads.
+PATH = "data/versions.bin"
+MAGIC = b'CAMPVERS'
+NAME_BYTES = 32
+HEADER = struct.Struct('<8s16s')
+SLOT = struct.Struct('<%dsQqq' % NAME_BYTES)
+VERSION = struct.Struct('<Q')
+MAX_SLOTS = 32
+SIZE = HEADER.size + SLOT.size * MAX_SLOTS
+
+
+class VersionFile:
+    def __init__(self, path=PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.instance = None
+        self._map = None
+        self._slots = {}
+
+    def _mapping(self):
+        with self.lock:
+            if self._map is None:
+                self._open()
+        return self._map
+
+    def _open(self):
+        with fileio.file_lock(self.path):
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size != SIZE or os.pread(fd, len(MAGIC), 0) != MAGIC:
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, SIZE)
+                    os.pwrite(fd, HEADER.pack(MAGIC, uuid.uuid4().bytes), 0)
+                    os.fsync(fd)
+                self._map = mmap.mmap(fd, SIZE)
+            finally:
+                os.close(fd)
+        self.instance = HEADER.unpack_from(self._map, 0)[1].hex()
+
+    def _slot(self, name):
+        # byte offset of name's slot, claiming a free one the first time
+        offset = self._slots.get(name)
+        if offset is not None:
+            return offset
+        mapping = self._mapping()
+        encoded = name.encode('utf-8')
+        with self.lock:
+            with fileio.file_lock(self.path):
+                free = None
+                for i in range(MAX_SLOTS):
+                    offset = HEADER.size + i * SLOT.size
+                    slot_name = SLOT.unpack_from(mapping, offset)[0].rstrip(b'\0')
+                    if slot_name == encoded:
+                        break
+                    if not slot_name and free is None:
+                        free = offset
+                else:
+                    if free is None:
+                        raise ValueError("no free version slot for %r" % name)
+                    offset = free
+                    SLOT.pack_into(mapping, offset, encoded, 0, 0, 0)
+            self._slots[name] = offset
+            return offset
+
+    def get(self, name):
+        offset = self._slot(name)
+        return self.instance, VERSION.unpack_from(self._map, offset + NAME_BYTES)[0]
+
+    def bump(self, name, file_stamp=None):
+        # -> (stamp just before, stamp just after); file_stamp is the data
+        # file's (mtime_ns, size) after the write
+        offset = self._slot(name)
+        mtime, size = file_stamp or (0, -1)
+        with self.lock, fileio.file_lock(self.path):
+            _, version, _, _ = SLOT.unpack_from(self._map, offset)
+            SLOT.pack_into(self._map, offset, name.encode('utf-8'), version + 1, mtime, size)
+        return (self.instance, version), (self.instance, version + 1)
+
+    def reconcile(self, name, file_stamp):
+        # bump if the data file changed without going through bump()
+        offset = self._slot(name)
+        _, _, mtime, size = SLOT.unpack_from(self._map, offset)
+        if (mtime, size) != tuple(file_stamp or (0, -1)):
+            self.bump(name, file_stamp)
+
+    def dump(self):
+        mapping = self._mapping()
+        result = {}
+        for i in range(MAX_SLOTS):
+            slot_name, version, _, _ = SLOT.unpack_from(mapping, HEADER.size + i * SLOT.size)
+            if slot_name.rstrip(b'\0'):
+                result[slot_name.rstrip(b'\0').decode('utf-8')] = version
+        return result
+
+
+if __name__ == "__main__":
+    # python -m pages.versions [bump <dataset>]
+    versions = VersionFile()
+    if sys.argv[1:2] == ["bump"] and len(sys.argv) == 3:
+        print("%s: %d" % (sys.argv[2], versions.bump(sys.argv[2])[1][1]))
+    else:
+        for name, version in versions.dump().items():
+            print("%s: %d" % (name, version))
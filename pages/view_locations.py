@@ -1,24 +1,9 @@
-import csv
 from dash import html, dcc, Input, Output, callback
 import dash_bootstrap_components as dbc
+from pages import repository
 
-LOC_CSV_PATH = "data/locations.csv"
 BLUE = "#2f80ed"
 
-def read_locations():
-    locations = []
-    with open(LOC_CSV_PATH, 'r', newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            locations.append({
-                'id': int(row['id']),
-                'name': row['name'],
-                'building': row['building'],
-                'floor': int(row['floor']),
-                'accessible': row['accessible'].lower() == 'true'
-            })
-    return locations
-
 def generate_locations_table_view(locations):
     header = html.Tr([
         html.Th("ID", className="p-2 bg-light border"),
@@ -60,7 +45,7 @@ def generate_locations_table_view(locations):
     )
 
 def view_locations_layout():
-    locations = read_locations()
+    locations = repository.read_locations()
 
     return dbc.Container([
         dbc.Card(
@@ -86,11 +71,7 @@ def view_locations_layout():
     Input("view-search-loc", "value")
 )
 def search_locations(text):
-    locations = read_locations()
-
     if not text:
-        return generate_locations_table_view(locations)
+        return generate_locations_table_view(repository.read_locations())
 
-    t = text.lower()
-    filtered = [loc for loc in locations if t in str(loc).lower()]
-    return generate_locations_table_view(filtered)
+    return generate_locations_table_view(repository.search('locations', text))
@@ -1,22 +1,13 @@
-import os
 import dash
-import pandas as pd
 from dash import html, dcc, Input, Output, callback
 import dash_bootstrap_components as dbc
+from pages import repository
 
 
-NOTIF_CSV_PATH = "data/notification.csv"
 BLUE = "#2f80ed"
 
 
-def read_notifications():
-    if os.path.exists(NOTIF_CSV_PATH):
-        return pd.read_csv(NOTIF_CSV_PATH)
-    return pd.DataFrame(columns=["id", "user_id", "message", "delivered"])
-
-
-
-def generate_notifications_table(df):
+def generate_notifications_table(notifications):
     header = html.Tr([
         html.Th("ID", className="p-2 bg-light border"),
         html.Th("User ID", className="p-2 bg-light border"),
@@ -25,15 +16,15 @@ def generate_notifications_table(df):
     ])
 
     rows = []
-    for _, row in df.iterrows():
-        delivered_text = "✅ Yes" if row.delivered else "❌ No"
-        delivered_color = BLUE if row.delivered else "red"
+    for row in notifications:
+        delivered_text = "✅ Yes" if row["delivered"] else "❌ No"
+        delivered_color = BLUE if row["delivered"] else "red"
 
         rows.append(
             html.Tr([
-                html.Td(row.id, className="p-2 border"),
-                html.Td(row.user_id, className="p-2 border"),
-                html.Td(row.message, className="p-2 border"),
+                html.Td(row["id"], className="p-2 border"),
+                html.Td(row["user_id"], className="p-2 border"),
+                html.Td(row["message"], className="p-2 border"),
                 html.Td(
                     html.Span(
                         delivered_text,
@@ -56,7 +47,7 @@ def generate_notifications_table(df):
 
 
 def layout():
-    df = read_notifications()
+    notifications = repository.read_notifications()
 
     return dbc.Container([
 
@@ -76,7 +67,7 @@ def layout():
                     )
                 ]),
              
-                html.Div(id="table-notif", children=generate_notifications_table(df))
+                html.Div(id="table-notif", children=generate_notifications_table(notifications))
             ]
         ),
 
@@ -89,10 +80,7 @@ def layout():
     Input("search-notif", "value")
 )
 def search_notifications(text):
-    df = read_notifications()
     if not text:
-        return generate_notifications_table(df)
+        return generate_notifications_table(repository.read_notifications())
 
-    t = text.lower()
-    df = df[df.apply(lambda r: t in str(r).lower(), axis=1)]
-    return generate_notifications_table(df)
+    return generate_notifications_table(repository.search('notifications', text))
@@ -1,26 +1,9 @@
-import os
-import csv
 from dash import html, dcc, Input, Output, callback
 import dash_bootstrap_components as dbc
+from pages import repository
 
-CSV_PATH = "data/routes.csv"
 BLUE = "#2f80ed"
 
-def read_routes():
-    routes = []
-    if os.path.exists(CSV_PATH):
-        with open(CSV_PATH, 'r', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                routes.append({
-                    'id': int(row['id']),
-                    'start_location': row['start_location'],
-                    'end_location': row['end_location'],
-                    'distance_m': float(row['distance_m']),
-                    'accessible': row['accessible'].lower() == 'true'
-                })
-    return routes
-
 def generate_routes_table(routes):
     header = html.Tr([
         html.Th("ID", className="p-2 bg-light border"),
@@ -49,7 +32,7 @@ def generate_routes_table(routes):
 
 
 def view_routes_layout():
-    routes = read_routes()
+    routes = repository.read_routes()
     return dbc.Container([
 
 
@@ -81,9 +64,6 @@ def view_routes_layout():
     prevent_initial_call=True
 )
 def search_routes(text):
-    routes = read_routes()
     if not text:
-        return generate_routes_table(routes)
-    t = text.lower()
-    filtered = [r for r in routes if t in str(r).lower()]
-    return generate_routes_table(filtered)
+        return generate_routes_table(repository.read_routes())
+    return generate_routes_table(repository.search('routes', text))
@@ -0,0 +1,35 @@
+import os
+import sys
+import subprocess
+import pytest
+from pages import route_graph, route_table, search_index, storage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def backend(request, tmp_path, monkeypatch):
+    # an empty data/ of its own, through a fresh storage object of each kind
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage, 'BACKEND', request.param)
+    monkeypatch.setattr(storage, '_storage', None)
+    monkeypatch.setattr(search_index, '_indexes', {table: search_index.SearchIndex(table) for table in storage.TABLES})
+    route_graph.invalidate()
+    route_table._tables.clear()
+    yield request.param
+    route_graph.invalidate()
+    route_table._tables.clear()
+
+
+@pytest.fixture
+def worker_env(backend):
+    # environment for another process on the same data/, like a second web worker
+    return dict(os.environ, STORAGE_BACKEND=backend, PYTHONPATH=ROOT)
+
+
+@pytest.fixture
+def run_worker(worker_env):
+    def run(code):
+        subprocess.run([sys.executable, "-c", code], env=worker_env, check=True)
+    return run
@@ -0,0 +1,24 @@
+import time
+from pages.route_graph import RouteGraph
+
+
+def chain(hops, parallel):
+    # hops locations in a row, each pair joined by parallel routes
+    routes = []
+    for hop in range(hops):
+        for p in range(parallel):
+            routes.append({'id': len(routes) + 1, 'start_location': f"N{hop}", 'end_location': f"N{hop + 1}",
+                           'distance_m': 10 + p, 'accessible': True})
+    return RouteGraph(routes)
+
+
+def test_k_shortest_paths_keeps_to_time_budget():
+    # 30 ** 6 alternatives, each spur search far too short to check the deadline itself
+    graph = chain(6, 30)
+    start = time.monotonic()
+    paths = graph.k_shortest_paths("N0", "N6", k=2000, time_budget=0.05)
+    assert time.monotonic() - start < 0.5
+    assert 0 < len(paths) < 2000
+    assert paths[0]['distance_m'] == 60
+    distances = [p['distance_m'] for p in paths]
+    assert distances == sorted(distances)
@@ -0,0 +1,66 @@
+import random
+import numpy as np
+from pages import repository, route_graph, route_table
+from pages.route_graph import RouteGraph
+from pages.route_table import RouteTable
+
+
+def random_routes(rng, locations, count):
+    routes = []
+    for route_id in range(1, count + 1):
+        start, end = rng.sample(range(locations), 2)
+        routes.append({'id': route_id, 'start_location': f"L{start}", 'end_location': f"L{end}",
+                       'distance_m': rng.randint(1, 50), 'accessible': True})
+    return routes
+
+
+def assert_matches_fresh(table, graph):
+    fresh = RouteTable(graph)
+    assert np.array_equal(table.dist, fresh.dist)
+    # every first hop still leads along a shortest path
+    for start in graph.names:
+        for end in graph.names:
+            if start != end and table.distance(start, end) is not None:
+                assert table.shortest_path(start, end)['distance_m'] == fresh.distance(start, end)
+
+
+def test_patched_table_equals_fresh_table():
+    rng = random.Random(9)
+    for _ in range(5):
+        routes = random_routes(rng, 25, 60)
+        graph = RouteGraph(routes)
+        table = RouteTable(graph)
+        next_id = len(routes) + 1
+        for step in range(40):
+            if step % 2:
+                u, edge = graph.remove_route(rng.choice(graph.edge_arrays()[4].tolist()))
+                table.remove_edge(u, edge)
+            else:
+                start, end = rng.sample(range(27), 2)
+                graph.add_route({'id': next_id, 'start_location': f"L{start}", 'end_location': f"L{end}",
+                                 'distance_m': rng.randint(1, 50), 'accessible': True})
+                table.grow(len(graph.names))
+                table.insert_edge(*graph.route(next_id))
+                next_id += 1
+            table.version = graph.version
+        assert_matches_fresh(table, graph)
+
+
+def test_tables_follow_route_edits_from_another_worker(run_worker):
+    repository.add_routes(random_routes(random.Random(4), 20, 50))
+    network = route_graph.get_network()
+    route_table.rebuild(network, background=False)
+    table = route_table.get_table(network)
+
+    run_worker((
+        "from pages import repository\n"
+        "repository.update_route(dict(repository.read_routes()[0].to_dict(), distance_m=1.0))\n"
+        "repository.delete_route(2)\n"
+        "repository.add_route({'id': None, 'start_location': 'L1', 'end_location': 'L19', 'distance_m': 2.0, 'accessible': True})\n"
+    ))
+
+    # patched from the route log rather than reloaded and rebuilt
+    assert route_graph.get_network() is network
+    assert route_table.get_table(network) is table
+    assert network.full.route(2) is None
+    assert_matches_fresh(table, network.full)
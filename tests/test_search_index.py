@@ -0,0 +1,52 @@
+from pages import repository, search_index
+
+
+def location(name, building="Main", floor=1):
+    return {'id': None, 'name': name, 'building': building, 'floor': floor, 'accessible': True}
+
+
+def names(records):
+    return sorted(r['name'] for r in records)
+
+
+def test_index_follows_adds_updates_and_deletes(backend):
+    library = repository.add_location(location("Library"))
+    repository.add_location(location("Lecture Hall A"))
+    assert names(repository.search('locations', "l")) == ["Lecture Hall A", "Library"]
+    stamp = search_index._indexes['locations'].stamp
+
+    repository.update_location(dict(library.to_dict(), name="Reading Room"))
+    assert names(repository.search('locations', "library")) == []
+    assert names(repository.search('locations', "READING")) == ["Reading Room"]
+
+    repository.delete_location(library['id'])
+    assert names(repository.search('locations', "room")) == []
+    assert names(repository.search('locations', "hall")) == ["Lecture Hall A"]
+    # patched by this process's writes, not indexed again
+    assert search_index._indexes['locations'].stamp != stamp
+    assert search_index._indexes['locations'].stamp == repository.stamp('locations')
+
+
+def test_index_catches_up_with_another_process(run_worker):
+    repository.add_location(location("Library"))
+    notification = repository.add_notification("Library closed for maintenance")
+    assert names(repository.search('locations', "lib")) == ["Library"]
+    assert len(repository.search('notifications', "closed")) == 1
+
+    run_worker(
+        "from pages import repository\n"
+        "repository.add_location({'id': None, 'name': 'Gym', 'building': 'Sports', 'floor': 0, 'accessible': True})\n"
+        "repository.update_notification({'id': %d, 'user_id': 1, 'message': 'Library open again', 'delivered': False})\n"
+        "repository.add_notification('Gym closed')\n" % notification
+    )
+
+    # the moved stamp sends the next search back to the store
+    assert names(repository.search('locations', "gym")) == ["Gym"]
+    assert sorted(n['message'] for n in repository.search('notifications', "closed")) == ["Gym closed"]
+    assert [n['message'] for n in repository.search('notifications', "again")] == ["Library open again"]
+
+
+def test_passwords_are_not_searchable(backend):
+    repository.add_user({'username': "alice", 'email': "alice@example.com", 'role': "admin", 'password': "hunter2"})
+    assert repository.search('users', "hunter") == []
+    assert [u['username'] for u in repository.search('users', "alice")] == ["alice"]
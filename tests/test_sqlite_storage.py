@@ -0,0 +1,76 @@
+import csv
+import threading
+import pytest
+from pages import storage
+from pages.storage import DuplicateKey, SqliteStorage
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return SqliteStorage(str(tmp_path / "data" / "campus.db"))
+
+
+def route(start, end, distance=10.0, route_id=None):
+    return {'id': route_id, 'start_location': start, 'end_location': end, 'distance_m': distance, 'accessible': True}
+
+
+def test_crud(db):
+    first = db.insert('routes', route("A", "B"))
+    second, third = db.insert_many('routes', [route("B", "C"), route("C", "A")])
+    assert [first['id'], second['id'], third['id']] == [1, 2, 3]
+
+    assert db.update('routes', 2, dict(second.to_dict(), distance_m=25.5))
+    assert not db.update('routes', 99, route("X", "Y", route_id=99))
+    assert db.delete('routes', 1)
+    assert not db.delete('routes', 1)
+
+    assert [(r['id'], r['distance_m']) for r in db.records('routes')] == [(2, 25.5), (3, 10.0)]
+    # read back from the database itself, not the cache
+    assert [(r['id'], r['distance_m']) for r in SqliteStorage(db.path).records('routes')] == [(2, 25.5), (3, 10.0)]
+    assert [r['id'] for r in db.scan('routes', {'start_location': "C"})] == [3]
+
+    db.insert('closures', {'notification_id': 7, 'opened_at': 1.0, 'expires_at': 2.0})
+    with pytest.raises(DuplicateKey):
+        db.insert('closures', {'notification_id': 7, 'opened_at': 3.0, 'expires_at': 4.0})
+
+
+def test_concurrent_id_reservations_are_disjoint(db):
+    # the RETURNING update takes the write lock, so no two blocks overlap
+    blocks = []
+
+    def reserve():
+        other = SqliteStorage(db.path)
+        for _ in range(50):
+            blocks.append(other.reserve_ids('routes', 3))
+
+    threads = [threading.Thread(target=reserve) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ids = [i for block in blocks for i in block]
+    assert len(ids) == len(set(ids)) == 600
+    assert db.insert('routes', route("A", "B"))['id'] == 601
+
+
+def test_migrate_csv(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    with open("data/routes.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(storage.fields('routes'))
+        writer.writerow([4, "Library", "Gym", 120.5, True])
+        writer.writerow([9, "Gym", "Library", 130, False])
+
+    counts = storage.migrate_csv("data/campus.db")
+    db = SqliteStorage("data/campus.db")
+
+    assert counts['routes'] == 2
+    assert [r.to_dict() for r in db.records('routes')] == [
+        {'id': 4, 'start_location': "Library", 'end_location': "Gym", 'distance_m': 120.5, 'accessible': True},
+        {'id': 9, 'start_location': "Gym", 'end_location': "Library", 'distance_m': 130.0, 'accessible': False}
+    ]
+    # the sequence carries on past the migrated ids
+    assert db.insert('routes', route("A", "B"))['id'] == 10
@@ -0,0 +1,114 @@
+import os
+import sys
+import csv
+import threading
+import subprocess
+import pytest
+from pages import repository, storage
+from pages.storage import CsvStorage
+
+WORKERS = 4
+PER_WORKER = 25
+
+WRITER = """
+import sys
+from pages import repository
+w, count = int(sys.argv[1]), int(sys.argv[2])
+mine = []
+for i in range(count):
+    mine.append(repository.add_location({'id': None, 'name': 'w%d-%d' % (w, i), 'building': 'B', 'floor': w, 'accessible': True}))
+    repository.add_notification('w%d-%d' % (w, i))
+for location in mine:
+    repository.update_location(dict(location.to_dict(), building='updated'))
+"""
+
+
+def check_written(rows):
+    # every worker's rows, once each, whole, each with its own id
+    assert len(rows) == WORKERS * PER_WORKER
+    ids = [r['id'] for r in rows]
+    assert len(set(ids)) == len(ids)
+    expected = {'w%d-%d' % (w, i) for w in range(WORKERS) for i in range(PER_WORKER)}
+    assert {r['name'] if 'name' in r else r['message'] for r in rows} == expected
+
+
+def test_concurrent_processes_lose_nothing(backend, worker_env):
+    workers = [subprocess.Popen([sys.executable, "-c", WRITER, str(w), str(PER_WORKER)], env=worker_env) for w in range(WORKERS)]
+    assert all(p.wait(timeout=120) == 0 for p in workers)
+
+    locations = repository.read_locations()
+    check_written(locations)
+    # no worker's rewrite of the file put back rows another had updated
+    assert {r['building'] for r in locations} == {'updated'}
+    check_written(repository.read_notifications())
+    if backend == 'csv':
+        with open("data/locations.csv", newline="", encoding="utf-8") as f:
+            check_written(list(csv.DictReader(f)))
+
+
+def test_concurrent_threads_lose_nothing(backend):
+    def write(w):
+        for i in range(PER_WORKER):
+            repository.add_location({'id': None, 'name': 'w%d-%d' % (w, i), 'building': 'B', 'floor': w, 'accessible': True})
+            repository.add_notification('w%d-%d' % (w, i))
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(WORKERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    check_written(repository.read_locations())
+    check_written(repository.read_notifications())
+
+
+@pytest.fixture
+def csv_backend(backend):
+    if backend != 'csv':
+        pytest.skip("append log is CSV only")
+    return storage.get_storage()
+
+
+def test_log_is_replayed_by_another_reader(csv_backend):
+    first = repository.add_notification("first")
+    second = repository.add_notification("second")
+    repository.update_notification({'id': first, 'user_id': 1, 'message': "first, edited", 'delivered': True})
+    repository.delete_notification(second)
+
+    assert not os.path.exists("data/notification.csv")
+    # a fresh backend, like another process, reads the CSV and replays the log
+    records = CsvStorage().records('notifications')
+    assert [(r['id'], r['message'], r['delivered']) for r in records] == [(first, "first, edited", True)]
+
+
+def test_compaction_folds_the_log_into_the_csv(csv_backend):
+    ids = [repository.add_notification("n%d" % i) for i in range(10)]
+    repository.delete_notification(ids[0])
+    before = repository.read_notifications()
+
+    csv_backend.compact('notifications')
+
+    assert os.path.getsize("data/notification.log") == 0
+    assert CsvStorage().records('notifications') == before
+    assert repository.read_notifications() == before
+    repository.add_notification("after")
+    assert [r['message'] for r in CsvStorage().records('notifications')][-1] == "after"
+
+
+def test_tail_returns_only_new_entries(backend):
+    _, cursor = repository.tail_notifications()
+    nid = repository.add_notification("one")
+    repository.delete_notification(nid)
+
+    changes, cursor = repository.tail_notifications(cursor)
+    assert [c['op'] for c in changes] == ['add', 'delete']
+    assert changes[0]['record']['message'] == "one"
+    assert changes[1]['key'] == nid
+    assert repository.tail_notifications(cursor)[0] == []
+
+    # once the entries are gone, the caller is told to read the table again
+    repository.add_notification("two")
+    if backend == 'csv':
+        storage.get_storage().compact('notifications')
+    else:
+        repository.save_notifications(repository.read_notifications())
+    assert repository.tail_notifications(cursor)[0] is None